@@ -2,34 +2,60 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
 from PIL import Image, ImageTk
 import os
-import shutil
-from datetime import datetime
-import requests
+import queue
+import threading
+import time
+import metrics
+from profiler import SamplingProfiler
+from assets import AssetManager
+from thumbnails import ThumbnailCache
+from catalog import Catalog, EMPTY_IMAGE
+from product_store import ConflictError
+from product_table import ProductTable
+from task_runner import TaskRunner
+import bulk_io
+
+# Where products are stored: a .txt file (journaled) or a .db/.sqlite file (SQLite)
+PRODUCTS_FILE = "products.txt"
+
+# How long typing must pause before the search runs
+SEARCH_DELAY_MS = 250
+
+# How often to look for products other instances saved to the same files
+REFRESH_INTERVAL_MS = 2000
 
 class ProductManagementApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Product Management System")
-        if not os.path.exists("products.txt"):
-            with open("products.txt", "w", encoding="utf-8") as file:
-                file.write("")
-        if not os.path.exists("category.txt"):
-            # Add default categories to the category.txt file
-            default_categories = ["Electronics", "Clothing", "Books", "Food", "Toys", "Sports"]
-            with open("category.txt", "w", encoding="utf-8") as file:
-                file.write("\n".join(default_categories))
-        
-        # Create images directory if not exists
-        if not os.path.exists("images"):
-            os.makedirs("images")
-        
+
+        # All product, category and image operations go through the headless catalog.
+        # Text catalogs are journaled to products.txt.journal and compacted in the background.
+        self.catalog = Catalog(PRODUCTS_FILE)
+        self.catalog.ensure_files()
+        # Loading, saving and searching run on a worker thread, one task at a time.
+        # The store is used directly on the Tk thread only for reading rows, once loaded.
+        self.store = None
+        self.selected_row = None  # the product last loaded into the entry fields
+        self.watching = False
+        self.tasks = TaskRunner(self.root, on_busy=self.set_busy)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Timings are always collected; F12 shows them. PRODUCT_PROFILE=<file> also
+        # samples the whole session, startup included, and writes it there on exit.
+        self.profiler = SamplingProfiler()
+        self.profile_path = os.environ.get("PRODUCT_PROFILE")
+        if self.profile_path:
+            self.profiler.start()
+        self.debug_window = None
+        self.root.bind("<F12>", lambda event: self.open_debug_panel())
+
         self.initialize_ui()
 
     def initialize_ui(self):
 
         try:
-            with open("category.txt", "r", encoding="utf-8") as cat_file:
-                categories = cat_file.read().splitlines()
+            categories = self.catalog.categories()
         except FileNotFoundError:
             messagebox.showerror("Error", "Categories file not found.")
             categories = []
@@ -67,9 +93,16 @@ class ProductManagementApp:
         self.entry_search = tk.Entry(self.frame_input)
         self.entry_search.grid(row=6, column=0, padx=5, pady=5, sticky="e")
 
-        # Treeview widget to display products in a table format
-        self.tree = ttk.Treeview(self.frame_input, columns=("Product ID", "Name", "Price", "Product Description", "Stock Quantity", "Category", "Date Added", "Last Updated"), show="headings")
-        self.tree.grid(row=7, column=0, columnspan=4, rowspan=6, pady=1)
+        # Search as you type, once typing pauses; Enter searches at once
+        self.search_after = None
+        self.last_search = None
+        self.entry_search.bind("<KeyRelease>", self.schedule_search)
+        self.entry_search.bind("<Return>", lambda event: self.search_product())
+
+        # Treeview widget to display products in a table format; only the visible rows are materialized
+        self.table = ProductTable(self.frame_input, columns=("Product ID", "Name", "Price", "Product Description", "Stock Quantity", "Category", "Date Added", "Last Updated"), fetch=self.fetch_product)
+        self.table.frame.grid(row=7, column=0, columnspan=4, rowspan=6, pady=1)
+        self.tree = self.table.tree
 
         # Define columns
         self.tree.heading("Product ID", text="Product ID", anchor="center")
@@ -116,6 +149,21 @@ class ProductManagementApp:
         self.button_add_image = tk.Button(self.frame_input, text="Add Image", command=self.add_image)
         self.button_add_image.grid(row=0, column=4, columnspan=2, pady=5)
 
+        # Buttons for bulk import and export
+        self.button_import = tk.Button(self.frame_input, text="Import Products", command=self.import_products)
+        self.button_import.grid(row=1, column=4, padx=0, pady=0)
+
+        self.button_export = tk.Button(self.frame_input, text="Export Products", command=self.export_products)
+        self.button_export.grid(row=2, column=4, padx=0, pady=0)
+
+        # Label for progress of long-running operations
+        self.status_label = tk.Label(self.frame_input, text="", anchor="w")
+        self.status_label.grid(row=13, column=0, columnspan=4, sticky="w")
+
+        # Moves while background work is running
+        self.busy_bar = ttk.Progressbar(self.frame_input, mode="indeterminate", length=100)
+        self.busy_bar.grid(row=13, column=4, padx=5, pady=5)
+
         # Button for managing categories
         self.button_manage_categories = tk.Button(self.frame_input, text="Manage Categories", command=self.manage_categories)
         self.button_manage_categories.grid(row=12, column=4, padx=5, pady=5, sticky="w")
@@ -123,39 +171,48 @@ class ProductManagementApp:
         self.button_search = tk.Button(self.frame_input, text="Search", command=self.search_product)
         self.button_search.grid(row=6, column=1, padx=5, pady=5, sticky="w")
 
+        # Show only one category; the counts are refreshed after every change
+        self.filter_category = None
+        self.filter_names = [None]
+        self.category_counts = {}
+        self.category_filter = ttk.Combobox(self.frame_input, values=["All Categories"], state="readonly")
+        self.category_filter.current(0)
+        self.category_filter.grid(row=6, column=2, padx=5, pady=5, sticky="w")
+        self.category_filter.bind("<<ComboboxSelected>>", self.filter_by_category)
+
         # Label to display image
         self.image_label = tk.Label(self.frame_input)
+        self.thumbnails = ThumbnailCache(os.path.join("images", ".thumbnails"))
+        self.placeholder_photo = None
         self.image_label.grid(row=0, column=2, columnspan=2, rowspan=6, pady=5)
 
         # Initialize images
         self.initialize_images()
 
         # Display initial image
-        initial_image_path = os.path.join("images", "empty_image.jpg")
-        self.display_image(initial_image_path)
+        self.display_image(EMPTY_IMAGE)
 
         # Load products from file
         self.load_products()
 
     def initialize_images(self):
-        # URL of the image to download
-        image_url = "https://cdn.discordapp.com/attachments/795709879234854932/1211785714568798228/icon.ico?ex=65ef7664&is=65dd0164&hm=72ae87a0c7de371617c8e0ca2feb4f7fa90847969c07396eff3196ec1d64a116&"
-        image_url2 = "https://cdn.discordapp.com/attachments/795709879234854932/1211786700506931221/empty_image.jpg?ex=65ef774f&is=65dd024f&hm=b0b65a87aec207690c4ef22d9a84b7a5ddd940c7c116467113dea1534869f54d&"
-        target_folder = "images"
-        target_path = os.path.join(target_folder, "icon.ico")
-        target_path2 = os.path.join(target_folder, "empty_image.jpg")
-
-        # Download the image from the URL
-        response = requests.get(image_url)
-        if response.status_code == 200:
-            # Save the image file to the 'images' folder
-            with open(target_path, 'wb') as f:
-                f.write(response.content)
-        response = requests.get(image_url2)
-        if response.status_code == 200:
-            # Save the image file to the 'images' folder
-            with open(target_path2, 'wb') as f:
-                f.write(response.content)
+        # Use the bundled images; anything missing or damaged is fetched (and images
+        # without a checksum revalidated) in the background so the window never
+        # waits on the network
+        with metrics.timer("initialize_images"):
+            self.assets = AssetManager("images")
+            self.images_started = time.perf_counter()
+            if self.assets.refresh_async() is not None:
+                self.root.after(500, self.check_images)
+
+    def check_images(self):
+        if self.assets.thread.is_alive():
+            self.root.after(500, self.check_images)
+            return
+        metrics.observe("initialize_images.download", time.perf_counter() - self.images_started)
+        if self.missing_image_path:
+            # Replace the placeholder now that the image may be available
+            self.display_image(self.missing_image_path)
 
     def add_product(self):
          product_id = self.entry_product_id.get()
@@ -164,46 +221,36 @@ class ProductManagementApp:
          description = self.text_description.get("1.0", "end-1c")
          stock_quantity = self.entry_stock_quantity.get()
          category = self.selected_category.get()
-         date_added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-         last_updated = ""
 
-         if product_id and name and price and description and stock_quantity and category:
-             image_path = ""  # Default to empty string if image path is not set
+         image_path = ""  # Default to empty string if image path is not set
+         if hasattr(self, 'image_path'):
+             image_path = self.image_path
+
+         def added(row):
              if hasattr(self, 'image_path'):
-                 image_path = self.image_path
                  # Clear the attribute to prevent reusing the same path
                  delattr(self, 'image_path')
 
-             if image_path and os.path.exists(image_path):
-                 # Copy the image file to the 'images' folder
-                 image_filename = os.path.basename(image_path)
-                 target_folder = "images"
-                 if not os.path.exists(target_folder):
-                     os.makedirs(target_folder)
-                 target_path = os.path.join(target_folder, image_filename)
-                 shutil.copy(image_path, target_path)
-                 image_path = target_path
-
-             with open("products.txt", "a", encoding="utf-8") as file:
-                 file.write(f"{product_id},{name},{price},{description},{stock_quantity},{category},{date_added},{last_updated},{image_path}\n")
-
-             self.tree.insert("", tk.END, values=(product_id, name, price, description, stock_quantity, category, date_added, last_updated, image_path))
+             self.table.append(product_id)
              self.clear_entries()
              self.clear_image()  # Clear image after adding product
-             self.display_image("images/empty_image.jpg")
+             self.display_image(EMPTY_IMAGE)
              self.category_dropdown.set("")
-         else:
-             messagebox.showerror("Error", "Please fill in all fields.")
+             self.refresh_category_filter()
+
+         self.tasks.submit(self.catalog.add_product, product_id, name, price, description, stock_quantity, category, image_path,
+                           on_done=added, on_error=self.show_error, name="add_product")
 
     def edit_product(self):
-        selection = self.tree.selection()
+        selection = self.table.selection()
         if not selection:
             messagebox.showerror("Error", "Please select a product to edit.")
             return
+        if len(selection) > 1:
+            self.batch_edit_products(selection)
+            return
 
-        item = self.tree.selection()[0]
-        values = self.tree.item(item, "values")
-        old_product_id = values[0]
+        old_product_id = selection[0]
 
         # Retrieve new product information from the entry fields
         new_product_id = self.entry_product_id.get()
@@ -212,102 +259,110 @@ class ProductManagementApp:
         new_description = self.text_description.get("1.0", "end-1c")  # Get text from the Text widget
         new_stock_quantity = self.entry_stock_quantity.get()
         new_category = self.selected_category.get()  # Get selected category
-        new_date_added = values[6]
-        new_last_updated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        if not new_product_id or not new_name or not new_price or not new_description or not new_stock_quantity or not new_category:
-            messagebox.showerror("Error", "Please fill in all fields.")
-            return
+        # Use the new image if one was selected, otherwise keep the existing one
+        new_image_path = getattr(self, 'image_path', None)
 
-        # Retrieve the existing image path
-        old_image_path = values[8]
+        # The product as it was loaded into the form; if another user has saved it
+        # since, the edit is refused instead of overwriting their change
+        expected = self.selected_row if self.selected_row is not None and self.selected_row[0] == old_product_id else None
 
-        # Check if a new image is selected
-        if hasattr(self, 'image_path'):
-            new_image_path = self.image_path  # Get the new image path
-            if old_image_path and old_image_path != "images/empty_image.jpg":
-                if os.path.exists(old_image_path):  # Check if old image still exists
-                    os.remove(old_image_path)  # Delete the old image if it exists
-                else:
-                    old_image_path = ""  # If old image does not exist, treat as if it's empty
+        def edited(row):
+            if hasattr(self, 'image_path'):
+                # Clear the attribute to prevent reusing the same path
+                delattr(self, 'image_path')
 
-            # Copy the new image file to the 'images' folder
-            if os.path.exists(new_image_path):
-                image_filename = os.path.basename(new_image_path)
-                target_folder = "images"
-                if not os.path.exists(target_folder):
-                    os.makedirs(target_folder)
-                target_path = os.path.join(target_folder, image_filename)
-                shutil.copy(new_image_path, target_path)
-                new_image_path = target_path
-
-            # Clear the attribute to prevent reusing the same path
-            delattr(self, 'image_path')
-
-        else:
-            new_image_path = old_image_path  # Keep the existing image path if no new image is selected
+            # Update product information in the Treeview
+            self.table.replace(old_product_id, new_product_id)
 
-        # Update product information in the Treeview
-        self.tree.item(item, values=(new_product_id, new_name, new_price, new_description, new_stock_quantity, new_category, new_date_added, new_last_updated, new_image_path))
+            # Clear entries and display empty image after editing
+            self.clear_entries()
+            self.clear_image()
+            self.display_image(EMPTY_IMAGE)
+            self.category_dropdown.set("")
+            self.refresh_category_filter()
 
-        # Update product information in the products.txt file
-        with open("products.txt", "r", encoding="utf-8") as file:
-            lines = file.readlines()
-
-        with open("products.txt", "w", encoding="utf-8") as file:
-            for line in lines:
-                data = line.strip().split(",")
-                if data[0] == old_product_id:
-                    file.write(f"{new_product_id},{new_name},{new_price},{new_description},{new_stock_quantity},{new_category},{new_date_added},{new_last_updated},{new_image_path}\n")
-                else:
-                    file.write(line)
-
-        # Clear entries and display empty image after editing
-        self.clear_entries()
-        self.clear_image()
-        self.display_image("images/empty_image.jpg")
-        self.category_dropdown.set("")
+        self.tasks.submit(self.catalog.edit_product, old_product_id, new_product_id, new_name, new_price, new_description,
+                          new_stock_quantity, new_category, new_image_path, expected, on_done=edited,
+                          on_error=self.show_error, name="edit_product")
 
 
     def delete_product(self):
-        selection = self.tree.selection()
+        selection = self.table.selection()
         if not selection:
             messagebox.showerror("Error", "Please select a product to delete.")
             return
+        if len(selection) > 1 and not messagebox.askyesno("Delete Products", f"Delete {len(selection)} products?"):
+            return
 
-        item = self.tree.selection()[0]
-        values = self.tree.item(item, "values")
-        product_id = values[0]
+        def deleted(rows):
+            # Delete the products from the Treeview
+            self.table.remove_many(selection)
+            self.refresh_category_filter()
 
-        # Delete the product from the Treeview
-        self.tree.delete(item)
+            if len(rows) == 1:
+                messagebox.showinfo("Success", "Product deleted successfully.")
+            else:
+                messagebox.showinfo("Success", f"{len(rows)} products deleted successfully.")
 
-        # Remove the product from the products.txt file
-        with open("products.txt", "r", encoding="utf-8") as file:
-            lines = file.readlines()
+        # Remove the products (and their images, unless another product still uses them) in one write
+        self.tasks.submit(self.catalog.delete_products, selection, on_done=deleted, on_error=self.show_error,
+                          name="delete_product")
 
-        with open("products.txt", "w", encoding="utf-8") as file:
-            for line in lines:
-                data = line.strip().split(",")
-                if data[0] != product_id:
-                    file.write(line)
-                else:
-                    # Delete the image file associated with the product
-                    image_path = data[-1]
-                    if image_path and image_path != "images/empty_image.jpg":
-                        if os.path.exists(image_path):
-                            os.remove(image_path)
+    def batch_edit_products(self, product_ids):
+        # Open a new window for changing price, stock or category of all selected products at once
+        batch_window = tk.Toplevel(self.root)
+        batch_window.title(f"Edit {len(product_ids)} Products")
+
+        tk.Label(batch_window, text="Set Price:").grid(row=0, column=0, sticky="w")
+        entry_price = tk.Entry(batch_window)
+        entry_price.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+
+        tk.Label(batch_window, text="Change Price by (%):").grid(row=1, column=0, sticky="w")
+        entry_price_percent = tk.Entry(batch_window)
+        entry_price_percent.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+
+        tk.Label(batch_window, text="Set Stock Quantity:").grid(row=2, column=0, sticky="w")
+        entry_stock_quantity = tk.Entry(batch_window)
+        entry_stock_quantity.grid(row=2, column=1, padx=5, pady=5, sticky="w")
+
+        tk.Label(batch_window, text="Set Category:").grid(row=3, column=0, sticky="w")
+        category_dropdown = ttk.Combobox(batch_window, values=self.category_dropdown.cget("values"), state="readonly")
+        category_dropdown.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+
+        def apply_changes():
+            # Empty fields stay as they are
+            price, price_percent, stock_quantity, category = (
+                value.strip() or None for value in (entry_price.get(), entry_price_percent.get(), entry_stock_quantity.get(), category_dropdown.get()))
 
-        messagebox.showinfo("Success", "Product deleted successfully.")
+            def updated(rows):
+                batch_window.destroy()
+                # Redraw the visible rows once
+                self.table.render()
+                self.refresh_category_filter()
+                messagebox.showinfo("Success", f"{len(rows)} products updated successfully.")
+
+            button_apply.config(state=tk.DISABLED)
+            self.tasks.submit(self.catalog.update_products, product_ids, price, price_percent, stock_quantity, category,
+                              on_done=updated, on_error=failed, name="batch_edit_products")
+
+        def failed(error):
+            button_apply.config(state=tk.NORMAL)
+            messagebox.showerror("Error", str(error), parent=batch_window)
+
+        button_apply = tk.Button(batch_window, text="Apply", command=apply_changes)
+        button_apply.grid(row=4, column=1, padx=5, pady=5, sticky="e")
+
+        button_cancel = tk.Button(batch_window, text="Cancel", command=batch_window.destroy)
+        button_cancel.grid(row=4, column=0, padx=5, pady=5, sticky="w")
 
     def select_product(self):
-        selection = self.tree.selection()
+        selection = self.table.selection()
         if not selection:
             messagebox.showerror("Error", "Please select a product.")
             return
 
-        item = self.tree.selection()[0]
-        values = self.tree.item(item, "values")
+        values = self.selected_row = self.store.get(selection[0])
 
         # Set values of entry fields to selected product's information
         self.entry_product_id.delete(0, tk.END)
@@ -328,10 +383,11 @@ class ProductManagementApp:
         self.category_dropdown.set(values[5])
 
         # Display selected product's image
-        image_path = values[8] if values[8] else "images/empty_image.jpg"
+        image_path = values[8] if values[8] else EMPTY_IMAGE
         self.display_image(image_path)
 
     def clear_entries(self):
+        self.selected_row = None
         self.entry_product_id.delete(0, tk.END)
         self.entry_name.delete(0, tk.END)
         self.entry_price.delete(0, tk.END)
@@ -348,49 +404,300 @@ class ProductManagementApp:
             self.display_image(file_path)
 
     def display_image(self, path):
-        # Open the image file
-        image = Image.open(path)
-        # Resize the image
-        image = image.resize((200, 200))
-        # Convert image to Tkinter PhotoImage
-        photo = ImageTk.PhotoImage(image)
-        # Update the image label
-        self.image_label.configure(image=photo)
-        self.image_label.image = photo  # Keep a reference to the image to prevent garbage collection
+        # Show a cached 200x200 thumbnail, or a blank placeholder if the file is not there (yet)
+        with metrics.timer("display_image"):
+            if os.path.exists(path):
+                photo = self.thumbnails.photo(path)
+                self.missing_image_path = None
+            else:
+                if self.placeholder_photo is None:
+                    self.placeholder_photo = ImageTk.PhotoImage(Image.new("RGB", (200, 200), "white"))
+                photo = self.placeholder_photo
+                self.missing_image_path = path
+            # Update the image label
+            self.image_label.configure(image=photo)
+            self.image_label.image = photo  # Keep a reference to the image to prevent garbage collection
 
     def clear_image(self):
         # Clear the image label
         self.image_label.configure(image="")
 
+    def schedule_search(self, event=None):
+        # Every keystroke that changes the query restarts the delay
+        if self.entry_search.get().lower() == self.last_search:
+            return
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+        self.search_after = self.root.after(SEARCH_DELAY_MS, self.search_product)
+
     def search_product(self):
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+            self.search_after = None
         search_query = self.entry_search.get().lower()
+        self.last_search = search_query
+
+        # Show the matching products; the table reuses rows that are already on screen.
+        # A newer search (or reload) makes this one stale, so its result is never shown.
+        self.tasks.submit(self.catalog.search_ids, search_query, None, self.filter_category, key="results", on_done=self.table.set_ids,
+                          name="search_product")
+
+    def filter_by_category(self, event=None):
+        self.filter_category = self.filter_names[self.category_filter.current()]
+        self.search_product()
+
+    def refresh_category_filter(self):
+        # Update the product counts in the category filter
+        def refreshed(counts):
+            self.category_counts = dict(counts)
+            self.filter_names = [None] + [name for name, _ in counts]
+            self.category_filter.config(values=["All Categories"] + [f"{name} ({count})" for name, count in counts])
+            if self.filter_category in self.filter_names:
+                self.category_filter.current(self.filter_names.index(self.filter_category))
+            else:
+                # The category was renamed or merged away
+                self.category_filter.current(0)
+                self.filter_category = None
+                self.search_product()
+
+        self.tasks.submit(self.catalog.category_counts, key="categories", on_done=refreshed, name="category_counts")
 
-        # Clear existing items in the Treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+    def load_products(self):
+        # Show every product; only the visible page is inserted into the Treeview.
+        # The first call loads the catalog on the worker thread.
+        self.last_search = None
+        self.filter_category = None
+        self.category_filter.current(0)
+
+        # The catalog is needed whatever happens, but a search typed while it loads
+        # decides what the table shows
+        results = self.tasks.claim("results")
+
+        def loaded(ids):
+            self.store = self.catalog.store
+            if not self.tasks.is_stale("results", results):
+                self.table.set_ids(ids)
+            self.refresh_category_filter()
+            if not self.watching:
+                self.watching = True
+                self.root.after(REFRESH_INTERVAL_MS, self.check_for_changes)
+
+        self.tasks.submit(self.catalog.ids, key="load", on_done=loaded, name="load_products")
+
+    def check_for_changes(self):
+        # Other clerks may run the app on the same products file (on a shared drive,
+        # say). Only what they changed is read; the view is updated if anything was.
+        def refreshed(changed):
+            if changed:
+                self.show_current_view()
+                self.refresh_category_filter()
+
+        self.tasks.submit(self.catalog.refresh, key="refresh", quiet=True, on_done=refreshed, name="refresh")
+        self.root.after(REFRESH_INTERVAL_MS, self.check_for_changes)
+
+    def show_current_view(self):
+        # Run the current search (or list every product) again without scrolling away
+        self.tasks.submit(self.catalog.search_ids, self.last_search or "", None, self.filter_category, key="results",
+                          on_done=lambda ids: self.table.set_ids(ids, keep_offset=True), name="show_current_view")
+
+    def fetch_product(self, product_id):
+        # Row for the table; nothing is shown until the catalog has been loaded
+        return self.store.get(product_id) if self.store is not None else None
+
+    def show_error(self, error):
+        messagebox.showerror("Error", str(error))
+        if isinstance(error, ConflictError):
+            # Show what the other user saved instead of the changes that were dropped
+            self.show_current_view()
+            self.refresh_category_filter()
+
+    def set_busy(self, busy):
+        # Busy cursor and a moving progress bar while background work is queued or running
+        if busy:
+            self.busy_bar.start(10)
+            self.root.config(cursor="watch")
+        else:
+            self.busy_bar.stop()
+            self.root.config(cursor="")
 
-        # Load products from file
-        with open("products.txt", "r", encoding="utf-8") as file:
-            for line in file:
-                data = line.strip().split(",")
-                if search_query in ",".join(data).lower():
-                    self.tree.insert("", tk.END, values=data)
+    def import_products(self):
+        file_path = filedialog.askopenfilename(title="Import Products", filetypes=[("Product Files", "*.csv *.jsonl *.ndjson"), ("All Files", "*.*")])
+        if not file_path:
+            return
 
-    def load_products(self):
-        # Clear existing items in the Treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        # A background thread parses and validates the file; batches are applied
+        # to the store one task at a time, so other work can run in between
+        report = bulk_io.ImportReport()
+        batches = queue.Queue(maxsize=4)
+
+        def read():
+            try:
+                for rows in bulk_io.read_batches(file_path, report):
+                    batches.put(rows)
+                batches.put(None)
+            except Exception as e:
+                batches.put(e)
+
+        def apply():
+            try:
+                item = batches.get_nowait()
+            except queue.Empty:
+                self.root.after(50, apply)
+                return
+            if isinstance(item, list):
+                self.tasks.submit(apply_batch, item, on_done=applied, on_error=finish, name="import_products")
+            else:
+                finish(item)
+
+        def apply_batch(rows):
+            bulk_io.apply_batch(self.catalog.store, rows, report, images=self.catalog.images)
+
+        def applied(result):
+            self.status_label.config(text=f"Importing... {report.read} records read")
+            apply()
+
+        def finish(item):
+            self.button_import.config(state=tk.NORMAL)
+            self.status_label.config(text="")
+            self.load_products()
+            if isinstance(item, Exception):
+                messagebox.showerror("Error", f"Import stopped: {item}\n{report.summary()}")
+            else:
+                details = "".join(f"\nRecord {number}: {message}" for number, message in report.errors[:10])
+                messagebox.showinfo("Import", report.summary() + details)
+
+        self.button_import.config(state=tk.DISABLED)
+        threading.Thread(target=read, name="product-import", daemon=True).start()
+        self.root.after(50, apply)
+
+    def export_products(self):
+        file_path = filedialog.asksaveasfilename(title="Export Products", defaultextension=".csv", filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not file_path:
+            return
 
-        # Load products from file
-        with open("products.txt", "r", encoding="utf-8") as file:
-            for line in file:
-                data = line.strip().split(",")
-                self.tree.insert("", tk.END, values=data)
+        # Rows are immutable tuples, so the writer thread can work from a snapshot
+        # of references, taken between other tasks
+        result = {}
+
+        def write(rows):
+            try:
+                result["count"] = bulk_io.export_file(rows, file_path)
+            except Exception as e:
+                result["error"] = e
+
+        def start(rows):
+            thread = threading.Thread(target=write, args=(rows,), name="product-export", daemon=True)
+            thread.start()
+            self.root.after(100, check, thread)
+
+        def check(thread):
+            if thread.is_alive():
+                self.root.after(100, check, thread)
+            else:
+                finish()
+
+        def failed(error):
+            result["error"] = error
+            finish()
+
+        def finish():
+            self.button_export.config(state=tk.NORMAL)
+            self.status_label.config(text="")
+            if "error" in result:
+                messagebox.showerror("Error", f"Export failed: {result['error']}")
+            else:
+                messagebox.showinfo("Export", f"{result['count']} products exported.")
+
+        self.button_export.config(state=tk.DISABLED)
+        self.status_label.config(text="Exporting...")
+        self.tasks.submit(lambda: list(self.catalog.rows()), on_done=start, on_error=failed, name="export_products")
+
+    def on_close(self):
+        # Let queued saves finish, then fold any outstanding journal records into products.txt
+        self.tasks.shutdown()
+        self.catalog.close(compact=True)
+        if self.profile_path and self.profiler.running:
+            self.profiler.stop()
+            self.profiler.save(self.profile_path)
+        self.root.destroy()
+
+    def open_debug_panel(self):
+        # Counters and latency percentiles of every timed operation, refreshed every second
+        if self.debug_window is not None and self.debug_window.winfo_exists():
+            self.debug_window.lift()
+            return
+        window = self.debug_window = tk.Toplevel(self.root)
+        window.title("Debug: Timings")
+
+        columns = ("Count", "Errors", "Mean ms", "p50 ms", "p90 ms", "p99 ms", "Max ms")
+        tree = ttk.Treeview(window, columns=columns, height=16)
+        tree.heading("#0", text="Operation", anchor="w")
+        tree.column("#0", width=240)
+        for column in columns:
+            tree.heading(column, text=column, anchor="e")
+            tree.column(column, width=70, anchor="e")
+        tree.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+
+        profile_text = tk.Text(window, height=12, width=100, wrap="none")
+        profile_text.pack(padx=10, fill=tk.BOTH, expand=True)
+
+        def refresh():
+            if not window.winfo_exists():
+                return
+            snapshot = metrics.METRICS.snapshot()
+            tree.delete(*tree.get_children())
+            for name, summary in snapshot["operations"].items():
+                tree.insert("", tk.END, text=name, values=(
+                    summary["count"], summary["errors"], f"{summary['mean_ms']:.1f}", f"{summary['p50_ms']:.1f}",
+                    f"{summary['p90_ms']:.1f}", f"{summary['p99_ms']:.1f}", f"{summary['max_ms']:.1f}"))
+            for name, count in snapshot["counters"].items():
+                tree.insert("", tk.END, text=name, values=(count,))
+            window.after(1000, refresh)
+
+        def reset():
+            metrics.METRICS.reset()
+
+        def export():
+            path = filedialog.asksaveasfilename(title="Export Timings", defaultextension=".json", parent=window,
+                                                filetypes=[("JSON", "*.json"), ("Prometheus Text", "*.prom *.txt")])
+            if path:
+                try:
+                    metrics.METRICS.export(path)
+                except OSError as e:
+                    messagebox.showerror("Error", str(e), parent=window)
+
+        def toggle_profiler():
+            if not self.profiler.running:
+                self.profiler = SamplingProfiler()
+                self.profiler.start()
+                self.profile_path = None
+                button_profile.config(text="Stop Profiling")
+                return
+            self.profiler.stop()
+            button_profile.config(text="Start Profiling")
+            profile_text.delete("1.0", tk.END)
+            profile_text.insert(tk.END, self.profiler.report())
+            path = filedialog.asksaveasfilename(title="Save Profile (folded stacks)", defaultextension=".folded",
+                                                parent=window, filetypes=[("Folded Stacks", "*.folded *.txt")])
+            if path:
+                self.profiler.save(path)
+
+        button_reset = tk.Button(window, text="Reset", command=reset)
+        button_reset.pack(side=tk.LEFT, padx=5, pady=5)
+
+        button_export = tk.Button(window, text="Export...", command=export)
+        button_export.pack(side=tk.LEFT, padx=5, pady=5)
+
+        button_profile = tk.Button(window, text="Stop Profiling" if self.profiler.running else "Start Profiling",
+                                   command=toggle_profiler)
+        button_profile.pack(side=tk.RIGHT, padx=5, pady=5)
+
+        refresh()
 
     def clear(self):
         self.clear_entries()
         self.clear_image()
-        self.display_image("images/empty_image.jpg")
+        self.display_image(EMPTY_IMAGE)
         self.category_dropdown.set("")
 
     def manage_categories(self):
@@ -400,23 +707,44 @@ class ProductManagementApp:
 
         # Load categories from file
         try:
-            with open("category.txt", "r", encoding="utf-8") as cat_file:
-                categories = cat_file.read().splitlines()
+            categories = self.catalog.categories()
         except FileNotFoundError:
             messagebox.showerror("Error", "Categories file not found.")
             categories = []
 
-        def save_categories():
-            # Save categories to file
-            with open("category.txt", "w", encoding="utf-8") as cat_file:
-                cat_file.write("\n".join(category_listbox.get(0, tk.END)))
-
-            # Update values in the main application
-            self.category_dropdown.config(values=category_listbox.get(0, tk.END))
-            self.category_dropdown.set("")  # Clear selection
+        # Renames and merges made in this window, applied to the products on Save
+        renames = []
 
-            # Close the category management window
-            category_window.destroy()
+        def save_categories():
+            categories = category_listbox.get(0, tk.END)
+
+            def save():
+                # Products in renamed or merged categories are moved in one write
+                self.catalog.rename_categories(renames)
+                self.catalog.save_categories(categories)
+
+            def saved(result):
+                # Update values in the main application
+                self.category_dropdown.config(values=categories)
+                self.category_dropdown.set("")  # Clear selection
+                self.table.render()
+                self.refresh_category_filter()
+
+                # Close the category management window
+                category_window.destroy()
+
+            self.tasks.submit(save, on_done=saved, on_error=self.show_error, name="save_categories")
+
+        def product_count(category):
+            # Products that will be in category once the renames so far are saved
+            count = 0
+            for name, name_count in self.category_counts.items():
+                for old, new in renames:
+                    if name == old:
+                        name = new
+                if name == category:
+                    count += name_count
+            return count
 
         def add_category():
             new_category = simpledialog.askstring("Add Category", "Enter new category:")
@@ -430,13 +758,27 @@ class ProductManagementApp:
                 old_category = category_listbox.get(index)
                 new_category = simpledialog.askstring("Edit Category", f"Edit category \"{old_category}\":", initialvalue=old_category)
                 if new_category:
+                    new_category = new_category.strip()
+                if not new_category or new_category == old_category:
+                    return
+                if new_category in category_listbox.get(0, tk.END):
+                    # Renaming to an existing category merges the two
+                    if not messagebox.askyesno("Merge Categories", f"Move all products in \"{old_category}\" to \"{new_category}\"?", parent=category_window):
+                        return
+                    category_listbox.delete(index)
+                else:
                     category_listbox.delete(index)
                     category_listbox.insert(index, new_category)
+                renames.append((old_category, new_category))
 
         def delete_category():
             selection = category_listbox.curselection()
             if selection:
                 index = selection[0]
+                count = product_count(category_listbox.get(index))
+                if count:
+                    messagebox.showerror("Error", f"{count} products are in this category. Rename it, or merge it into another category by renaming it to that name.", parent=category_window)
+                    return
                 category_listbox.delete(index)
 
         # Create a listbox to display categories
@@ -460,7 +802,8 @@ class ProductManagementApp:
         button_save = tk.Button(category_window, text="Save", command=save_categories)
         button_save.pack(side=tk.RIGHT, padx=5, pady=5)
         
-# Create the main application window
-root = tk.Tk()
-app = ProductManagementApp(root)
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    # Create the main application window
+    root = tk.Tk()
+    app = ProductManagementApp(root)
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+
+# Images the application needs. The copies bundled in images/ are used when
+# their checksum matches; only missing or damaged files are downloaded again.
+ASSETS = {
+    "icon.ico": {
+        "url": "https://cdn.discordapp.com/attachments/795709879234854932/1211785714568798228/icon.ico?ex=65ef7664&is=65dd0164&hm=72ae87a0c7de371617c8e0ca2feb4f7fa90847969c07396eff3196ec1d64a116&",
+        "sha256": "0a8ad4dd49f6fd4353a78113ac304a9432ae0bef9566081e52d4fa73ba47bf24",
+    },
+    "empty_image.jpg": {
+        "url": "https://cdn.discordapp.com/attachments/795709879234854932/1211786700506931221/empty_image.jpg?ex=65ef774f&is=65dd024f&hm=b0b65a87aec207690c4ef22d9a84b7a5ddd940c7c116467113dea1534869f54d&",
+        "sha256": "64e76b82ce45bf5d3bbfa4b7c06ea7dd169723b96fc8297b62946354be597a7a",
+    },
+}
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AssetManager:
+    def __init__(self, folder="images", assets=None, timeout=(3, 10)):
+        self.folder = folder
+        self.assets = ASSETS if assets is None else assets
+        self.timeout = timeout  # (connect, read) seconds for each download
+        # ETags of downloaded assets, so a refresh can be a cheap conditional request
+        self.metadata_path = os.path.join(folder, "assets.json")
+        self.thread = None
+        self.errors = {}
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def is_valid(self, name):
+        path = self.path(name)
+        if not os.path.exists(path):
+            return False
+        expected = self.assets[name].get("sha256")
+        return expected is None or file_sha256(path) == expected
+
+    def stale(self):
+        # Assets that are missing or fail their checksum
+        return [name for name in self.assets if not self.is_valid(name)]
+
+    def unverified(self):
+        # Assets present without a checksum: only the server can tell whether they
+        # are current, and the stored ETag makes asking a cheap conditional request
+        return [name for name in self.assets
+                if self.assets[name].get("sha256") is None and os.path.exists(self.path(name))]
+
+    def refresh_async(self, names=None):
+        # Download the given assets on a background thread; by default the stale
+        # ones, and the unverified ones if the server has a newer copy.
+        # Returns the thread, or None if there is nothing to fetch.
+        names = self.stale() + self.unverified() if names is None else names
+        if not names:
+            return None
+        self.thread = threading.Thread(target=self.refresh, args=(names,), name="asset-refresh", daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def refresh(self, names):
+        # requests is only imported when something actually has to be downloaded
+        try:
+            import requests
+            from requests.adapters import HTTPAdapter
+        except ImportError as e:
+            self.errors.update((name, e) for name in names)
+            return
+
+        metadata = self._load_metadata()
+        with requests.Session() as session:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=len(names), max_retries=2)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            for name in names:
+                try:
+                    etag = self._download(session, name, metadata.get(name, {}).get("etag"))
+                except (requests.RequestException, OSError, ValueError) as e:
+                    self.errors[name] = e
+                    continue
+                if etag:
+                    metadata[name] = {"etag": etag}
+        self._save_metadata(metadata)
+
+    def _download(self, session, name, etag):
+        # Returns the new ETag, or None if the server had nothing newer. Only a copy that
+        # passes its checksum is worth revalidating: a 304 would keep a damaged file forever.
+        headers = {"If-None-Match": etag} if etag and self.is_valid(name) else {}
+        response = session.get(self.assets[name]["url"], headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        content = response.content
+        expected = self.assets[name].get("sha256")
+        if expected is not None and hashlib.sha256(content).hexdigest() != expected:
+            raise ValueError(f"Checksum mismatch for {name}")
+        # Write next to the target and swap it in, so a failed download never leaves a broken file
+        tmp_path = self.path(name) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, self.path(name))
+        return response.headers.get("ETag", "")
+
+    def _load_metadata(self):
+        try:
+            with open(self.metadata_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_metadata(self, metadata):
+        with open(self.metadata_path, "w", encoding="utf-8") as file:
+            json.dump(metadata, file, indent=2)
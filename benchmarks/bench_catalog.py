@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Benchmarks the catalog operations headlessly on synthetic data:
+#
+#   python benchmarks/bench_catalog.py --sizes 10000 100000 1000000 --output results.json
+#
+# Every (backend, size) pair runs in a fresh interpreter, so peak RSS and I/O
+# counters belong to that run only. Results are printed (or written) as JSON.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = ("red blue green black white steel wooden cotton leather glass compact portable "
+         "wireless smart classic premium mini large phone laptop cable charger lamp chair "
+         "table novel guide shirt jacket shoes ball puzzle kettle blender camera").split()
+CATEGORIES = ["Electronics", "Clothing", "Books", "Food", "Toys", "Sports"]
+
+
+def generate_images(folder, count, size=(1600, 1200), seed=1):
+    # Noisy JPEGs, so decoding cost is similar to real product photos
+    from PIL import Image
+
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        image = Image.effect_noise(size, 64).convert("RGB")
+        image.paste((rng.randrange(256), rng.randrange(256), rng.randrange(256)), (0, 0, size[0] // 2, size[1] // 2))
+        path = os.path.join(folder, f"image_{i}.jpg")
+        image.save(path, quality=85)
+        paths.append(path)
+    return paths
+
+
+def generate_catalog(path, count, images=(), seed=1):
+    # products.txt with count synthetic products
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as file:
+        for i in range(count):
+            name = " ".join(rng.choices(WORDS, k=2)) + f" {i % 997}"
+            description = " ".join(rng.choices(WORDS, k=12))
+            image = images[i % len(images)] if images else ""
+            file.write(f"P{i:07d},{name},{rng.randrange(100, 100000) / 100},{description},{rng.randrange(500)},"
+                       f"{rng.choice(CATEGORIES)},2024-01-01 00:00:00,,{image}\n")
+
+
+def io_counters():
+    # Bytes read/written by this process (Linux only)
+    try:
+        with open("/proc/self/io", "r") as file:
+            counters = dict(line.split(": ") for line in file.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+
+    def pick(fraction):
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    return {
+        "count": len(samples),
+        "p50_ms": pick(0.50) * 1000,
+        "p90_ms": pick(0.90) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "max_ms": samples[-1] * 1000,
+        "mean_ms": sum(samples) / len(samples) * 1000,
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.results = {}
+
+    def measure(self, name, function, repeat):
+        # Small catalogs can leave nothing to sample, and percentiles() needs at least one
+        if repeat <= 0:
+            return
+        read_before, written_before = io_counters()
+        samples = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            function(i)
+            samples.append(time.perf_counter() - start)
+        read_after, written_after = io_counters()
+        result = percentiles(samples)
+        if read_before is not None:
+            result["bytes_read"] = read_after - read_before
+            result["bytes_written"] = written_after - written_before
+        self.results[name] = result
+
+
+def run_worker(backend, size, repeat, image_count):
+    from catalog import Catalog
+    from thumbnails import ThumbnailCache
+
+    workdir = tempfile.mkdtemp(prefix="bench_catalog_")
+    os.chdir(workdir)
+    try:
+        images = generate_images("source_images", image_count)
+        generate_catalog("products.txt", size, images)
+        products_file = "products.txt"
+        if backend == "sqlite":
+            from product_storage import migrate_text_to_sqlite
+
+            migrate_text_to_sqlite("products.txt", "products.db")
+            products_file = "products.db"
+        rng = random.Random(2)
+        recorder = Recorder()
+        rss_before = peak_rss_bytes()
+
+        catalog = Catalog(products_file)
+        # First access loads the catalog; the GUI then takes the id list for the table
+        recorder.measure("load_products", lambda i: catalog.ids(), 1)
+        rss_loaded = peak_rss_bytes()
+
+        queries = [" ".join(rng.choices(WORDS, k=rng.randint(1, 3))) for _ in range(repeat)]
+        queries += [f"p{rng.randrange(size):07d}"[:rng.randint(3, 8)] for _ in range(repeat)]
+        # The search index is built on the first search, so time that separately
+        recorder.measure("build_search_index", lambda i: catalog.search_ids("warmup"), 1)
+        recorder.measure("search_product", lambda i: catalog.search_ids(queries[i]), len(queries))
+
+        # The first ids are edited and the rest deleted; a catalog smaller than
+        # --repeat gets fewer samples rather than indexing past the end
+        ids = rng.sample(catalog.ids(), min(size, repeat * 2))
+        edits = min(repeat, len(ids))
+
+        def edit(i):
+            row = catalog.get(ids[i])
+            catalog.edit_product(row[0], row[0], row[1], str(float(row[2]) + 1), row[3], row[4], row[5])
+
+        recorder.measure("edit_product", edit, edits)
+        recorder.measure("delete_product", lambda i: catalog.delete_product(ids[edits + i]), len(ids) - edits)
+
+        # display_image without a display: the PIL work behind it, cold and then cached
+        thumbnails = ThumbnailCache(os.path.join("images", ".thumbnails"))
+        recorder.measure("display_image_cold", lambda i: thumbnails.thumbnail(images[i]), len(images))
+        recorder.measure("display_image_cached", lambda i: thumbnails.thumbnail(images[i % len(images)]),
+                         repeat if images else 0)
+
+        catalog.close()
+        return {
+            "backend": backend,
+            "products": size,
+            "operations": recorder.results,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "peak_rss_before_load_bytes": rss_before,
+            "peak_rss_after_load_bytes": rss_loaded,
+        }
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark catalog operations on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--backends", nargs="+", choices=("text", "sqlite"), default=["text", "sqlite"])
+    parser.add_argument("--repeat", type=int, default=50, help="samples per operation")
+    parser.add_argument("--images", type=int, default=10, help="number of synthetic product images")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--worker", nargs=2, metavar=("BACKEND", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker[0], int(args.worker[1]), args.repeat, args.images)))
+        return
+
+    runs = []
+    for backend in args.backends:
+        for size in args.sizes:
+            print(f"{backend} / {size} products...", file=sys.stderr)
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", backend, str(size),
+                                     "--repeat", str(args.repeat), "--images", str(args.images)],
+                                    check=True, capture_output=True, text=True).stdout
+            runs.append(json.loads(output))
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
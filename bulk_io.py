@@ -0,0 +1,174 @@
+import csv
+import json
+import os
+from datetime import datetime
+
+from product_storage import FIELDS, check_row
+
+# Column names accepted in import files besides the FIELDS names themselves
+# (matched case-insensitively, with spaces treated as underscores)
+ALIASES = {
+    "id": "product_id",
+    "name_product": "name",
+    "price_product": "price",
+    "product_description": "description",
+    "stock": "stock_quantity",
+    "image": "image_path",
+}
+
+REQUIRED = ("product_id", "name", "price", "description", "stock_quantity", "category")
+
+
+def _field_name(key):
+    key = str(key).strip().lower().replace(" ", "_")
+    return ALIASES.get(key, key)
+
+
+def detect_format(path):
+    return "jsonl" if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson", ".json") else "csv"
+
+
+def read_records(path, fmt=None):
+    # Yield one {field: value} dict per input record without reading the whole file
+    fmt = fmt or detect_format(path)
+    with open(path, "r", encoding="utf-8-sig", newline="") as file:
+        if fmt == "jsonl":
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    data = None
+                if isinstance(data, list):
+                    data = dict(zip(FIELDS, data))
+                # Anything that is not an object is passed on for validate() to reject
+                yield {_field_name(key): value for key, value in data.items()} if isinstance(data, dict) else data
+        else:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            if header is None:
+                return
+            names = [_field_name(name) for name in header]
+            if "product_id" not in names:
+                # No header: columns are in products.txt order
+                names = list(FIELDS)
+                yield dict(zip(names, header))
+            for values in reader:
+                if values:
+                    yield dict(zip(names, values))
+
+
+def validate(record, now):
+    # Turn an input record into a product row, or raise ValueError
+    if not isinstance(record, dict):
+        raise ValueError("not a valid record")
+    values = {field: "" if record.get(field) is None else str(record[field]).strip() for field in FIELDS}
+    missing = [field for field in REQUIRED if not values[field]]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    check_row(tuple(values[field] for field in FIELDS))
+    values["date_added"] = values["date_added"] or now
+    return tuple(values[field] for field in FIELDS)
+
+
+class ImportReport:
+    MAX_ERRORS = 100
+
+    def __init__(self):
+        self.read = 0
+        self.added = 0
+        self.updated = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.errors = []  # (record number, message), first MAX_ERRORS only
+
+    def error(self, number, message):
+        self.invalid += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append((number, message))
+
+    def summary(self):
+        return (f"{self.read} records read: {self.added} added, {self.updated} updated, "
+                f"{self.skipped} skipped, {self.invalid} invalid")
+
+
+def read_batches(path, report, fmt=None, batch_size=1000):
+    # Parse and validate path, yielding lists of rows. Duplicate Product IDs
+    # within the file are skipped after their first occurrence.
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    seen = set()
+    batch = []
+    for number, record in enumerate(read_records(path, fmt), 1):
+        report.read += 1
+        try:
+            row = validate(record, now)
+        except ValueError as e:
+            report.error(number, str(e))
+            continue
+        if row[0] in seen:
+            report.skipped += 1
+            continue
+        seen.add(row[0])
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def apply_batch(store, rows, report, update_existing=True, images=None):
+    # Add or update one batch of rows and write it out in a single flush
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    saved = []  # (old row, new row), for image references once the batch is saved
+    for row in rows:
+        if images is not None and row[8] and os.path.isfile(row[8]):
+            row = row[:8] + (images.import_file(row[8]),)
+        old_row = store.get(row[0])
+        if old_row is None:
+            store.add(row)
+            report.added += 1
+        elif update_existing:
+            # Keep the original date added, and the image when the file gives none
+            # (a price or stock feed must not clear it); the import counts as an update
+            row = row[:6] + (old_row[6], now, row[8] or old_row[8])
+            store.update(row[0], row)
+            report.updated += 1
+        else:
+            report.skipped += 1
+            continue
+        saved.append((old_row, row))
+    store.flush()
+    if images is not None:
+        for old_row, row in saved:
+            images.acquire(row[8])
+            if old_row is not None:
+                images.release(old_row[8])
+
+
+def import_file(store, path, fmt=None, update_existing=True, images=None, batch_size=1000, progress=None):
+    report = ImportReport()
+    for rows in read_batches(path, report, fmt, batch_size):
+        apply_batch(store, rows, report, update_existing, images)
+        if progress is not None:
+            progress(report)
+    return report
+
+
+def export_file(rows, path, fmt=None):
+    # Stream rows to a CSV (with header) or JSONL file; returns the number written
+    fmt = fmt or detect_format(path)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        if fmt == "jsonl":
+            for row in rows:
+                file.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n")
+                count += 1
+        else:
+            writer = csv.writer(file)
+            writer.writerow(FIELDS)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+    return count
@@ -0,0 +1,295 @@
+import math
+import os
+from datetime import datetime
+
+# Product, category and image operations without any GUI. Everything heavy is
+# imported and loaded on first use, so a one-off lookup stays cheap.
+
+DEFAULT_CATEGORIES = ["Electronics", "Clothing", "Books", "Food", "Toys", "Sports"]
+EMPTY_IMAGE = os.path.join("images", "empty_image.jpg")
+
+
+def now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Catalog:
+    def __init__(self, products_file="products.txt", categories_file="category.txt", images_folder="images", journal=True):
+        self.products_file = products_file
+        self.categories_file = categories_file
+        self.images_folder = images_folder
+        self.journal = journal
+        self._storage = None
+        self._store = None
+        self._images = None
+
+    def ensure_files(self):
+        # Create the data files and folders the application expects
+        if not self.products_file.endswith((".db", ".sqlite", ".sqlite3")) and not os.path.exists(self.products_file):
+            with open(self.products_file, "w", encoding="utf-8") as file:
+                file.write("")
+        if not os.path.exists(self.categories_file):
+            with open(self.categories_file, "w", encoding="utf-8") as file:
+                file.write("\n".join(DEFAULT_CATEGORIES))
+        if not os.path.exists(self.images_folder):
+            os.makedirs(self.images_folder)
+
+    @property
+    def storage(self):
+        if self._storage is None:
+            from product_storage import migrate_text_to_sqlite, open_storage
+
+            # Move existing products into the SQLite database the first time it is used
+            if self.products_file.endswith((".db", ".sqlite", ".sqlite3")) and not os.path.exists(self.products_file) \
+                    and os.path.exists("products.txt"):
+                migrate_text_to_sqlite("products.txt", self.products_file)
+            self._storage = open_storage(self.products_file, journal=self.journal)
+        return self._storage
+
+    @property
+    def store(self):
+        # The whole catalog in memory, loaded on first use
+        if self._store is None:
+            from product_store import ProductStore
+
+            self._store = ProductStore(self.products_file, storage=self.storage)
+            self._store.on_change = self._saved_elsewhere
+            self._store.load()
+        return self._store
+
+    @property
+    def images(self):
+        if self._images is None:
+            from image_store import ImageStore
+
+            self._images = ImageStore(self.images_folder)
+            self._images.rebuild_refs(row[8] for row in self.store.rows())
+        return self._images
+
+    def _saved_elsewhere(self, changes):
+        # Another process saved these (old row, new row) pairs; keep image references in step
+        if self._images is not None:
+            for old_row, new_row in changes:
+                if new_row is not None:
+                    self._images.acquire(new_row[8])
+                if old_row is not None:
+                    self._images.release(old_row[8])
+
+    def refresh(self):
+        # Pick up products other instances saved to the same files; returns the changed ids
+        if self._store is None:
+            return []
+        return self.store.refresh()
+
+    # Products
+
+    def get(self, product_id):
+        # Answered by the backend directly when the catalog is not loaded yet
+        if self._store is None:
+            return self.storage.get(product_id)
+        return self.store.get(product_id)
+
+    def find_by_category(self, category):
+        # From the SQLite indexes when the catalog is not loaded yet
+        if self._store is None and hasattr(self.storage, "find_by_category"):
+            return self.storage.find_by_category(category)
+        return self.store.find_by_category(category)
+
+    def find_by_name(self, name):
+        # Names are matched case-insensitively; SQLite only folds ASCII, so other names load the catalog
+        if self._store is None and name.isascii() and hasattr(self.storage, "find_by_name"):
+            return self.storage.find_by_name(name)
+        return self.store.find_by_name(name)
+
+    def ids(self):
+        return self.store.ids()
+
+    def rows(self):
+        return self.store.rows()
+
+    def search_ids(self, query, limit=None, category=None):
+        return self.store.search_ids(query, limit, category)
+
+    def search(self, query, limit=None):
+        return self.store.search(query, limit)
+
+    def _check_fields(self, product_id, name, price, description, stock_quantity, category):
+        if not (product_id and name and price and description and stock_quantity and category):
+            raise ValueError("Please fill in all fields.")
+        self._check_row((product_id, name, price, description, stock_quantity, category))
+
+    def _check_row(self, row):
+        # The same rules as for imported products: valid price and stock, and no
+        # commas or line breaks that would break products.txt
+        from product_storage import check_row
+
+        check_row(row)
+
+    def _import_image(self, image_path):
+        # Copy an image into the image store; paths that do not exist are kept as given
+        if image_path and os.path.exists(image_path):
+            return self.images.import_file(image_path)
+        return image_path
+
+    def add_product(self, product_id, name, price, description, stock_quantity, category, image_path=""):
+        self._check_fields(product_id, name, price, description, stock_quantity, category)
+        if product_id in self.store:
+            raise ValueError(f"Product ID \"{product_id}\" already exists.")
+        images = self.images  # reference counts are built before the catalog changes
+        image_path = self._import_image(image_path)
+        row = (product_id, name, price, description, stock_quantity, category, now(), "", image_path)
+        self._check_row(row)
+        self.store.add(row)
+        self.store.flush()
+        images.acquire(image_path)
+        return self.store.get(product_id)
+
+    def edit_product(self, old_product_id, product_id, name, price, description, stock_quantity, category, image_path=None,
+                     expected=None):
+        # image_path=None keeps the current image. expected is the product as the
+        # user last saw it; if someone else has changed it since, ConflictError is raised.
+        old_row = self.store.get(old_product_id)
+        if old_row is None:
+            raise ValueError("Product not found.")
+        if expected is not None and old_row != expected:
+            from product_store import ConflictError
+
+            raise ConflictError([old_product_id])
+        self._check_fields(product_id, name, price, description, stock_quantity, category)
+        if product_id != old_product_id and product_id in self.store:
+            raise ValueError(f"Product ID \"{product_id}\" already exists.")
+        images = self.images
+        image_path = old_row[8] if image_path is None else self._import_image(image_path)
+        row = (product_id, name, price, description, stock_quantity, category, old_row[6], now(), image_path)
+        self._check_row(row)
+        self.store.update(old_product_id, row, expected)
+        self.store.flush()
+        # The old image is deleted only if no other product uses it
+        if image_path != old_row[8]:
+            images.acquire(image_path)
+            images.release(old_row[8])
+        return self.store.get(product_id)
+
+    def delete_product(self, product_id):
+        return self.delete_products([product_id])[0]
+
+    def delete_products(self, product_ids):
+        # Delete several products with a single write
+        product_ids = list(dict.fromkeys(product_ids))
+        if any(product_id not in self.store for product_id in product_ids):
+            raise ValueError("Product not found.")
+        images = self.images
+        rows = [self.store.delete(product_id) for product_id in product_ids]
+        self.store.flush()
+        for row in rows:
+            images.release(row[8])
+        return rows
+
+    def update_products(self, product_ids, price=None, price_percent=None, stock_quantity=None, category=None):
+        # Change price, stock or category of several products with a single write.
+        # Fields left as None stay the same; price_percent changes each price by that percentage.
+        rows = [self.store.get(product_id) for product_id in dict.fromkeys(product_ids)]
+        if any(row is None for row in rows):
+            raise ValueError("Product not found.")
+        if price is None and price_percent is None and stock_quantity is None and category is None:
+            raise ValueError("Please fill in at least one field.")
+        from product_storage import check_price, check_stock
+
+        if price is not None:
+            check_price(price)
+        try:
+            percent = None if price_percent is None else float(price_percent)
+        except ValueError:
+            percent = math.nan
+        if percent is not None and not math.isfinite(percent):
+            raise ValueError("Please enter a valid percentage.")
+        if stock_quantity is not None:
+            check_stock(stock_quantity)
+        if category is not None and not category:
+            raise ValueError("Please choose a category.")
+
+        # Every row is checked before anything changes
+        timestamp = now()
+        updated = []
+        for row in rows:
+            new_price = row[2] if price is None else price
+            if percent is not None:
+                try:
+                    new_price = f"{max(0.0, float(new_price) * (1 + percent / 100)):.2f}"
+                except ValueError:
+                    raise ValueError(f"Product \"{row[0]}\" has an invalid price.") from None
+            updated.append((row[0], row[1], new_price, row[3], row[4] if stock_quantity is None else stock_quantity,
+                            row[5] if category is None else category, row[6], timestamp, row[8]))
+            self._check_row(updated[-1])
+        for row in updated:
+            self.store.update(row[0], row)
+        self.store.flush()
+        return [self.store.get(row[0]) for row in updated]
+
+    # Bulk import and export
+
+    def import_file(self, path, fmt=None, update_existing=True, batch_size=1000, progress=None):
+        import bulk_io
+
+        return bulk_io.import_file(self.store, path, fmt, update_existing, self.images, batch_size, progress)
+
+    def export_file(self, path, fmt=None):
+        import bulk_io
+
+        return bulk_io.export_file(self.store.rows(), path, fmt)
+
+    # Categories
+
+    def categories(self):
+        with open(self.categories_file, "r", encoding="utf-8") as cat_file:
+            return cat_file.read().splitlines()
+
+    def save_categories(self, categories):
+        with open(self.categories_file, "w", encoding="utf-8") as cat_file:
+            cat_file.write("\n".join(categories))
+
+    def category_counts(self):
+        # (category, number of products) for the listed categories, then any others products use
+        counts = self.store.category_counts()
+        try:
+            names = dict.fromkeys(self.categories())
+        except FileNotFoundError:
+            names = {}
+        names.update(dict.fromkeys(sorted(set(counts) - set(names))))
+        return [(name, counts.get(name, 0)) for name in names]
+
+    def rename_categories(self, renames):
+        # Move products to new category names with a single write. renames is a list of
+        # (old, new) pairs applied in order; renaming to a category that already has
+        # products merges the two. Returns the number of products changed.
+        final = {}
+        for old, new in renames:
+            if not new or "," in new or "\n" in new:
+                raise ValueError(f"Invalid category name \"{new}\".")
+            for name, target in final.items():
+                if target == old:
+                    final[name] = new
+            final.setdefault(old, new)
+
+        # Every row is read before anything changes, so swapping two names works
+        timestamp = now()
+        updated = []
+        for old, new in final.items():
+            if old != new:
+                for product_id in self.store.category_ids(old):
+                    row = self.store.get(product_id)
+                    updated.append(row[:5] + (new, row[6], timestamp, row[8]))
+        for row in updated:
+            self.store.update(row[0], row)
+        self.store.flush()
+        return len(updated)
+
+    def close(self, compact=False):
+        # Write out pending changes and drop images no product refers to any more.
+        # compact=True also folds the journal into products.txt.
+        if self._store is not None:
+            self._store.close(compact)
+            if self._images is not None:
+                self._images.collect_garbage()
+        elif self._storage is not None:
+            self._storage.close(compact)
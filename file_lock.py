@@ -0,0 +1,77 @@
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    # Exclusive advisory lock on a lock file, shared by every process that
+    # uses the same path (also over network shares that support byte-range
+    # locks). Within one process the lock is reentrant for the thread holding
+    # it; with reentrant=False it can be released by another thread instead.
+    def __init__(self, path, reentrant=True):
+        self.path = path
+        self._lock = threading.RLock() if reentrant else threading.Lock()
+        self._count = 0
+        self._file = None
+
+    def acquire(self, blocking=True):
+        if not self._lock.acquire(blocking):
+            return False
+        if self._count == 0:
+            try:
+                self._file = self._lock_file(blocking)
+            except BaseException:
+                self._lock.release()
+                raise
+            if self._file is None:
+                self._lock.release()
+                return False
+        self._count += 1
+        return True
+
+    def _lock_file(self, blocking):
+        file = open(self.path, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.lockf(file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                file.seek(0)
+                while True:
+                    try:
+                        # LK_LOCK itself gives up after about 10 seconds
+                        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise
+        except OSError:
+            file.close()
+            if blocking:
+                raise
+            return None
+        return file
+
+    def release(self):
+        self._count -= 1
+        if self._count == 0:
+            file, self._file = self._file, None
+            try:
+                if fcntl is not None:
+                    fcntl.lockf(file.fileno(), fcntl.LOCK_UN)
+                else:
+                    file.seek(0)
+                    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                file.close()
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import tempfile
+import time
+
+
+class ImageStore:
+    # Product images stored once per unique content under blob_dir, named by
+    # their SHA-256. Reference counts (how many products use each image path)
+    # decide when a file can be removed.
+    #
+    # Other instances may share the folder, so files changed in the last
+    # RECENT_SECONDS (an image another instance is about to save) are kept.
+    RECENT_SECONDS = 600
+
+    def __init__(self, folder="images", blob_dir=None, protected=("empty_image.jpg", "icon.ico")):
+        self.folder = folder
+        self.blob_dir = blob_dir or os.path.join(folder, "blobs")
+        # Bundled images that are never deleted
+        self.protected = {os.path.normpath(os.path.join(folder, name)) for name in protected}
+        self.refs = {}  # normalized image path -> number of products using it
+
+    def import_file(self, source, chunk_size=1024 * 1024):
+        # Copy source into the store, hashing while copying so large files are
+        # never read into memory at once. Returns the stored path.
+        os.makedirs(self.blob_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, suffix=".tmp")
+        try:
+            with open(source, "rb") as src, os.fdopen(fd, "wb") as dst:
+                for chunk in iter(lambda: src.read(chunk_size), b""):
+                    digest.update(chunk)
+                    dst.write(chunk)
+            target = os.path.join(self.blob_dir, digest.hexdigest() + os.path.splitext(source)[1].lower())
+            try:
+                # Same content is already stored: mark it as in use again
+                os.utime(target)
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return target
+
+    def rebuild_refs(self, paths):
+        self.refs = {}
+        for path in paths:
+            self.acquire(path)
+
+    def acquire(self, path):
+        if path:
+            path = os.path.normpath(path)
+            self.refs[path] = self.refs.get(path, 0) + 1
+
+    def release(self, path):
+        # Drop one reference; the file is deleted once no product uses it
+        if not path:
+            return
+        path = os.path.normpath(path)
+        count = self.refs.get(path, 0) - 1
+        if count > 0:
+            self.refs[path] = count
+            return
+        self.refs.pop(path, None)
+        if self.is_managed(path) and os.path.exists(path) and not self.is_recent(path):
+            os.remove(path)
+
+    def is_recent(self, path):
+        return time.time() - os.path.getmtime(path) < self.RECENT_SECONDS
+
+    def is_managed(self, path):
+        # Only files inside the images folder (and not the bundled ones) are ever deleted
+        folder = os.path.abspath(self.folder)
+        path = os.path.normpath(path)
+        return path not in self.protected and os.path.commonpath([folder, os.path.abspath(path)]) == folder
+
+    def collect_garbage(self):
+        # Remove stored images (and leftover temp files) that no product references
+        removed = []
+        if not os.path.isdir(self.blob_dir):
+            return removed
+        for name in os.listdir(self.blob_dir):
+            path = os.path.normpath(os.path.join(self.blob_dir, name))
+            if path not in self.refs and os.path.isfile(path) and not self.is_recent(path):
+                os.remove(path)
+                removed.append(path)
+        return removed
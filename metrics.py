@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Timings of UI handlers, background tasks and storage calls, kept as counters
+# and latency histograms in one process-wide registry:
+#
+#   with metrics.timer("storage.write"):
+#       ...
+#
+# Names are dotted: "search_product" is the whole operation as the user sees
+# it, "search_product.worker" the part run on the catalog thread and
+# "search_product.ui" the part that updates the window.
+
+# Histogram bucket upper bounds in seconds (the last bucket is unbounded)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.errors = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds, error=False):
+        index = 0
+        while index < len(self.buckets) and seconds > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        if error:
+            self.errors += 1
+
+    def percentile(self, fraction):
+        # Estimated from the buckets, interpolating linearly inside the one it falls in
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "sum_seconds": self.sum,
+            "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p90_ms": self.percentile(0.90) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+            # Cumulative, as in the Prometheus format: observations <= each bound
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], _cumulative(self.counts))),
+        }
+
+
+def _cumulative(counts):
+    total = 0
+    result = []
+    for count in counts:
+        total += count
+        result.append(total)
+    return result
+
+
+class Metrics:
+    # Safe to use from the Tk thread and the catalog worker at the same time
+    def __init__(self):
+        self.histograms = {}  # name -> Histogram
+        self.counters = {}  # name -> number of events
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, error=False):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds, error)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        # Time the with-block; an exception counts as an error and is re-raised
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(name, time.perf_counter() - start, error=True)
+            raise
+        self.observe(name, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "operations": {name: self.histograms[name].summary() for name in sorted(self.histograms)},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        # Prometheus text exposition format, e.g. for node_exporter's textfile collector
+        snapshot = self.snapshot()
+        lines = ["# HELP product_operation_seconds Time taken by product management operations.",
+                 "# TYPE product_operation_seconds histogram"]
+        for name, summary in snapshot["operations"].items():
+            label = f"operation=\"{_escape(name)}\""
+            for bound, count in summary["buckets"].items():
+                lines.append(f"product_operation_seconds_bucket{{{label},le=\"{bound}\"}} {count}")
+            lines.append(f"product_operation_seconds_sum{{{label}}} {summary['sum_seconds']!r}")
+            lines.append(f"product_operation_seconds_count{{{label}}} {summary['count']}")
+        lines += ["# HELP product_operation_errors_total Operations that failed.",
+                  "# TYPE product_operation_errors_total counter"]
+        for name, summary in snapshot["operations"].items():
+            lines.append(f"product_operation_errors_total{{operation=\"{_escape(name)}\"}} {summary['errors']}")
+        lines += ["# HELP product_events_total Events such as search cache hits.",
+                  "# TYPE product_events_total counter"]
+        for name, count in snapshot["counters"].items():
+            lines.append(f"product_events_total{{event=\"{_escape(name)}\"}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path, fmt=None):
+        # fmt is "json" or "prometheus"; by default .json files get JSON and anything else Prometheus text
+        fmt = fmt or ("json" if path.lower().endswith(".json") else "prometheus")
+        text = self.to_json() if fmt == "json" else self.to_prometheus()
+        with open(path, "w", encoding="utf-8", newline="\n") as file:
+            file.write(text)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+# The registry everything in this process records to
+METRICS = Metrics()
+timer = METRICS.timer
+count = METRICS.count
+observe = METRICS.observe
@@ -0,0 +1,169 @@
+import argparse
+import cProfile
+import itertools
+import json
+import sys
+
+import metrics
+from catalog import Catalog
+from product_storage import FIELDS
+
+
+def print_rows(rows, as_json):
+    for row in rows:
+        if as_json:
+            print(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False))
+        else:
+            print("\t".join(value.replace("\n", " ") for value in row))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Manage products without the GUI.")
+    parser.add_argument("--products", default="products.txt", help="product file (.txt, or .db for SQLite)")
+    parser.add_argument("--json", action="store_true", help="print products as JSON lines")
+    parser.add_argument("--profile", metavar="FILE", help="profile the command with cProfile and save the stats to FILE")
+    parser.add_argument("--metrics", metavar="FILE", help="save operation timings to FILE (.json, else Prometheus text)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("get", help="show one product")
+    command.add_argument("product_id")
+
+    command = commands.add_parser("list", help="list products")
+    command.add_argument("--category")
+    command.add_argument("--name", help="products with exactly this name (ignoring case)")
+    command.add_argument("--limit", type=int)
+
+    command = commands.add_parser("search", help="search products by words in ID, name, category or description")
+    command.add_argument("query")
+    command.add_argument("--limit", type=int)
+
+    command = commands.add_parser("add", help="add a product")
+    command.add_argument("product_id")
+    command.add_argument("--name", required=True)
+    command.add_argument("--price", required=True)
+    command.add_argument("--description", required=True)
+    command.add_argument("--stock", required=True)
+    command.add_argument("--category", required=True)
+    command.add_argument("--image", default="")
+
+    command = commands.add_parser("edit", help="change a product; fields that are not given stay the same")
+    command.add_argument("product_id")
+    command.add_argument("--new-id")
+    command.add_argument("--name")
+    command.add_argument("--price")
+    command.add_argument("--description")
+    command.add_argument("--stock")
+    command.add_argument("--category")
+    command.add_argument("--image")
+
+    command = commands.add_parser("update", help="change price, stock or category of several products at once")
+    command.add_argument("product_ids", nargs="+", metavar="product_id")
+    command.add_argument("--price")
+    command.add_argument("--price-percent", help="change each price by this percentage, e.g. -10")
+    command.add_argument("--stock")
+    command.add_argument("--category")
+
+    command = commands.add_parser("delete", help="delete products")
+    command.add_argument("product_ids", nargs="+", metavar="product_id")
+
+    command = commands.add_parser("import", help="add or update products from a CSV/JSONL file")
+    command.add_argument("path")
+    command.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    command.add_argument("--skip-existing", action="store_true", help="do not update products that already exist")
+    command.add_argument("--batch-size", type=int, default=1000)
+
+    command = commands.add_parser("export", help="write every product to a CSV/JSONL file")
+    command.add_argument("path")
+    command.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+
+    command = commands.add_parser("categories", help="list categories")
+    command.add_argument("--counts", action="store_true", help="also show the number of products in each")
+
+    command = commands.add_parser("rename-category", help="rename a category, or merge it into an existing one")
+    command.add_argument("old")
+    command.add_argument("new")
+    return parser
+
+
+def run(catalog, args):
+    if args.command == "get":
+        row = catalog.get(args.product_id)
+        if row is None:
+            raise ValueError("Product not found.")
+        print_rows([row], args.json)
+    elif args.command == "list":
+        if args.category is not None:
+            rows = catalog.find_by_category(args.category)
+            if args.name is not None:
+                rows = [row for row in rows if row[1].lower() == args.name.lower()]
+        elif args.name is not None:
+            rows = catalog.find_by_name(args.name)
+        else:
+            rows = catalog.rows()
+        print_rows(itertools.islice(rows, args.limit), args.json)
+    elif args.command == "search":
+        print_rows(catalog.search(args.query, args.limit), args.json)
+    elif args.command == "add":
+        row = catalog.add_product(args.product_id, args.name, args.price, args.description, args.stock, args.category, args.image)
+        print_rows([row], args.json)
+    elif args.command == "edit":
+        old_row = catalog.get(args.product_id)
+        if old_row is None:
+            raise ValueError("Product not found.")
+        changes = (args.new_id, args.name, args.price, args.description, args.stock, args.category)
+        fields = [old if new is None else new for old, new in zip(old_row, changes)]
+        print_rows([catalog.edit_product(args.product_id, *fields, image_path=args.image)], args.json)
+    elif args.command == "update":
+        print_rows(catalog.update_products(args.product_ids, args.price, args.price_percent, args.stock, args.category), args.json)
+    elif args.command == "delete":
+        catalog.delete_products(args.product_ids)
+    elif args.command == "import":
+        report = catalog.import_file(args.path, args.format, not args.skip_existing, args.batch_size)
+        print(report.summary())
+        for number, message in report.errors:
+            print(f"record {number}: {message}", file=sys.stderr)
+    elif args.command == "export":
+        print(f"{catalog.export_file(args.path, args.format)} products exported")
+    elif args.command == "categories":
+        if args.counts:
+            for name, count in catalog.category_counts():
+                print(f"{name}\t{count}")
+        else:
+            print("\n".join(catalog.categories()))
+    elif args.command == "rename-category":
+        try:
+            categories = catalog.categories()
+        except FileNotFoundError:
+            categories = []
+        if args.old not in categories and not catalog.store.category_ids(args.old):
+            raise ValueError(f"Category \"{args.old}\" not found.")
+        count = catalog.rename_categories([(args.old, args.new)])
+        catalog.save_categories(dict.fromkeys(args.new if name == args.old else name for name in categories))
+        print(f"{count} products moved to \"{args.new}\"")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    catalog = Catalog(args.products)
+    profile = cProfile.Profile() if args.profile else None
+    if profile is not None:
+        profile.enable()
+    try:
+        with metrics.timer(args.command):
+            run(catalog, args)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        with metrics.timer("close"):
+            catalog.close()
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(args.profile)
+        if args.metrics:
+            metrics.METRICS.export(args.metrics)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
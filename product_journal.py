@@ -0,0 +1,172 @@
+import json
+import os
+import shutil
+import uuid
+
+
+def fsync_directory(path):
+    # Make a rename inside the directory durable (not supported on Windows)
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def journal_id(path):
+    # The name a journal file was given when it was created (it is kept when the
+    # file is renamed, unlike a path, and never reused, unlike an inode number);
+    # None if there is no such file
+    try:
+        with open(path, "rb") as file:
+            line = file.readline()
+            stat = os.fstat(file.fileno())
+    except FileNotFoundError:
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        record = None
+    if isinstance(record, dict) and record.get("op") == "journal":
+        return record["data"]
+    # Written before journals were named
+    return stat.st_dev, stat.st_ino
+
+
+class ProductJournal:
+    def __init__(self, path, max_bytes=4 * 1024 * 1024, max_records=10000):
+        self.path = path
+        self.old_path = path + ".old"
+        # Compaction is due once either threshold is crossed
+        self.max_bytes = max_bytes
+        self.max_records = max_records
+        self.records = 0
+        self.size = 0
+        self._file = None
+
+    def replay(self, apply):
+        # Feed every record to apply(op, payload); a half-written last line is ignored.
+        # Records from an interrupted compaction (.old) come first.
+        for path in (self.old_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record["op"] == "journal":
+                        continue
+                    apply(record["op"], record["data"])
+                    if path == self.path:
+                        self.records += 1
+        if os.path.exists(self.path):
+            self.size = os.path.getsize(self.path)
+
+    def read_from(self, path, offset):
+        # Records appended to path after byte offset, as (records, new offset).
+        # A line still being written is left for the next call.
+        try:
+            with open(path, "rb") as file:
+                file.seek(offset)
+                data = file.read()
+        except FileNotFoundError:
+            return [], offset
+        end = data.rfind(b"\n") + 1
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record["op"] != "journal":
+                records.append((record["op"], record["data"]))
+        return records, offset + end
+
+    def _open(self):
+        if self._file is None:
+            self._drop_partial_line()
+            self._file = open(self.path, "a", encoding="utf-8")
+            if self._file.tell() == 0:
+                self._write("journal", uuid.uuid4().hex)
+        return self._file
+
+    def _drop_partial_line(self):
+        # A writer that crashed mid-record leaves a half-written last line; cut it
+        # off, or the next record would be glued to it and skipped as invalid
+        try:
+            file = open(self.path, "r+b")
+        except FileNotFoundError:
+            return
+        with file:
+            end = file.seek(0, os.SEEK_END)
+            keep = 0
+            position = end
+            while position > 0:
+                start = max(0, position - 64 * 1024)
+                file.seek(start)
+                newline = file.read(position - start).rfind(b"\n")
+                if newline >= 0:
+                    keep = start + newline + 1
+                    break
+                position = start
+            if keep < end:
+                file.truncate(keep)
+                file.flush()
+                os.fsync(file.fileno())
+                self.size = max(0, self.size - (end - keep))
+
+    def _write(self, op, data):
+        line = json.dumps({"op": op, "data": data}, ensure_ascii=False) + "\n"
+        self._file.write(line)
+        self.size += len(line.encode("utf-8"))
+
+    def append(self, records):
+        # Write a batch of (op, data) records with a single fsync
+        if not records:
+            return
+        file = self._open()
+        for op, data in records:
+            self._write(op, data)
+            self.records += 1
+        file.flush()
+        os.fsync(file.fileno())
+
+    def needs_compaction(self):
+        return self.records >= self.max_records or self.size >= self.max_bytes
+
+    def rotate(self):
+        # Move the live log aside so new records go to a fresh file while
+        # the snapshot is written; the .old file is removed once it is safe
+        self.close()
+        if os.path.exists(self.path) and os.path.exists(self.old_path):
+            # An earlier compaction never finished: keep its records too
+            with open(self.path, "rb") as new, open(self.old_path, "ab") as old:
+                shutil.copyfileobj(new, old)
+                old.flush()
+                os.fsync(old.fileno())
+            os.remove(self.path)
+        elif os.path.exists(self.path):
+            os.replace(self.path, self.old_path)
+        self._reset()
+
+    def reopen(self):
+        # After another process rotated the journal: let go of the old file and counts
+        self.close()
+        self._reset()
+
+    def _reset(self):
+        self.records = 0
+        self.size = 0
+
+    def discard_old(self):
+        if os.path.exists(self.old_path):
+            os.remove(self.old_path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
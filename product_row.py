@@ -0,0 +1,124 @@
+import math
+import sys
+from operator import attrgetter
+
+from product_storage import FIELDS
+
+# Products as ProductStore keeps them in memory. A row read from disk is nine
+# strings; here prices are floats, stock quantities ints, timestamps 14-digit
+# ints (20240101093000), and categories and image paths are interned so
+# products share one copy. Values that would not read back exactly as they
+# were written are kept as strings.
+#
+# A ProductRow still reads like the old row tuple (row[2], row[:5], iteration,
+# ",".join(row)) and formats its values as strings only when they are read.
+
+
+def parse_price(text):
+    # Only prices that format back to exactly the same text ("19.99", not
+    # "19.999", "1e2" or "10") become floats, so nothing entered is ever changed
+    try:
+        price = float(text)
+    except ValueError:
+        return text
+    return price if math.isfinite(price) and f"{price:.2f}" == text else text
+
+
+def format_price(price):
+    return f"{price:.2f}" if isinstance(price, float) else price
+
+
+def parse_stock(text):
+    # Only canonical integers, so "007" is shown as it was entered
+    if text.isascii() and text.isdigit() and (text[0] != "0" or text == "0"):
+        return int(text)
+    return text
+
+
+def format_stock(stock_quantity):
+    return str(stock_quantity) if isinstance(stock_quantity, int) else stock_quantity
+
+
+# Recently parsed timestamps; products added or imported together share them
+_timestamps = {}
+
+
+def parse_timestamp(text):
+    # "2024-01-01 09:30:00" -> 20240101093000
+    timestamp = _timestamps.get(text)
+    if timestamp is not None:
+        return timestamp
+    timestamp = text
+    digits = text.replace("-", "").replace(" ", "").replace(":", "")
+    if len(digits) == 14 and len(text) == 19 and digits.isascii() and digits.isdigit() and \
+            text[4] == "-" and text[7] == "-" and text[10] == " " and text[13] == ":" and text[16] == ":":
+        timestamp = int(digits)
+    if len(_timestamps) >= 4096:
+        _timestamps.clear()
+    _timestamps[text] = timestamp
+    return timestamp
+
+
+def format_timestamp(timestamp):
+    if not isinstance(timestamp, int):
+        return timestamp
+    digits = f"{timestamp:014d}"
+    return f"{digits[0:4]}-{digits[4:6]}-{digits[6:8]} {digits[8:10]}:{digits[10:12]}:{digits[12:14]}"
+
+
+class ProductRow:
+    __slots__ = FIELDS
+
+    def __init__(self, values):
+        product_id, name, price, description, stock_quantity, category, date_added, last_updated, image_path = values
+        self.product_id = product_id
+        self.name = name
+        self.price = parse_price(price)
+        self.description = description
+        self.stock_quantity = parse_stock(stock_quantity)
+        self.category = sys.intern(category)
+        self.date_added = parse_timestamp(date_added)
+        self.last_updated = parse_timestamp(last_updated)
+        self.image_path = sys.intern(image_path)
+
+    def values(self):
+        # The row as the tuple of strings it was read from
+        return (self.product_id, self.name, format_price(self.price), self.description,
+                format_stock(self.stock_quantity), self.category, format_timestamp(self.date_added),
+                format_timestamp(self.last_updated), self.image_path)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.values()[index]
+        return _GETTERS[index](self)
+
+    def __iter__(self):
+        return iter(self.values())
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, (ProductRow, tuple, list)):
+            return self.values() == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.values())
+
+    def __repr__(self):
+        return f"ProductRow({self.values()!r})"
+
+
+# Column index -> function returning that column as a string
+_GETTERS = [
+    attrgetter("product_id"),
+    attrgetter("name"),
+    lambda row: format_price(row.price),
+    attrgetter("description"),
+    lambda row: format_stock(row.stock_quantity),
+    attrgetter("category"),
+    lambda row: format_timestamp(row.date_added),
+    lambda row: format_timestamp(row.last_updated),
+    attrgetter("image_path"),
+]
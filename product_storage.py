@@ -0,0 +1,464 @@
+import argparse
+import math
+import os
+import sqlite3
+import threading
+
+from file_lock import FileLock
+from product_journal import ProductJournal, journal_id, fsync_directory
+
+
+def file_fingerprint(paths):
+    # Size and modification time of each existing, non-empty file, to detect changes cheaply
+    fingerprint = []
+    for path in paths:
+        if os.path.exists(path) and os.path.getsize(path):
+            stat = os.stat(path)
+            fingerprint.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+# Column order of a product line in products.txt
+FIELDS = ("product_id", "name", "price", "description", "stock_quantity",
+          "category", "date_added", "last_updated", "image_path")
+
+
+def parse_line(line):
+    # Split one products.txt line into a row tuple with exactly len(FIELDS) columns.
+    # Descriptions may contain commas, so any extra columns are folded back into it.
+    data = line.strip().split(",")
+    if len(data) > len(FIELDS):
+        extra = len(data) - len(FIELDS)
+        data = data[:3] + [",".join(data[3:4 + extra])] + data[4 + extra:]
+    elif len(data) < len(FIELDS):
+        data += [""] * (len(FIELDS) - len(data))
+    return tuple(data)
+
+
+def format_line(row):
+    return ",".join(row) + "\n"
+
+
+def check_price(value):
+    try:
+        price = float(value)
+    except ValueError:
+        price = -1.0
+    # float("nan") < 0 is False, so non-finite values are rejected explicitly
+    if not (math.isfinite(price) and price >= 0):
+        raise ValueError("Price must be a number of 0 or more.")
+
+
+def check_stock(value):
+    try:
+        stock = int(value)
+    except ValueError:
+        stock = -1
+    if stock < 0:
+        raise ValueError("Stock quantity must be a whole number of 0 or more.")
+
+
+def check_row(row):
+    # Raise ValueError for a product the GUI, the CLI or an import must not save: a
+    # line break anywhere, a comma outside the description (products.txt could not
+    # hold them), a price that is not a number of 0 or more or a stock quantity that
+    # is not a whole number of 0 or more. row may be just the first columns.
+    for field, value in zip(FIELDS, row):
+        label = field.replace("_", " ").capitalize()
+        if "\n" in value or "\r" in value:
+            raise ValueError(f"{label} cannot contain line breaks.")
+        if "," in value and field != "description":
+            raise ValueError(f"{label} cannot contain commas.")
+    if len(row) > 2:
+        check_price(row[2])
+    if len(row) > 4:
+        check_stock(row[4])
+
+
+class TextFileStorage:
+    # The original products.txt format, optionally journaled
+    def __init__(self, path="products.txt", journal=False):
+        self.path = path
+        # In journaled mode every write appends to products.txt.journal and a
+        # background compaction folds the journal back into products.txt
+        self.journal = ProductJournal(path + ".journal") if journal else None
+        self._lock = threading.RLock()
+        # Every process using these files writes them while holding this lock,
+        # so instances sharing products.txt on a network drive take turns
+        self.lock = FileLock(path + ".lock")
+        # Only one process at a time compacts the journal
+        self._compaction_lock = FileLock(path + ".compact.lock", reentrant=False)
+        self._compaction = None
+        self._snapshot = None
+        # How far this process has read, for changes(): products.txt as (inode,
+        # size, mtime), the journal it follows and the offset reached in it, and
+        # the .old journal of a compaction it has already read to the end
+        self._base = None
+        self._journal_id = None
+        self._offset = 0
+        self._old_id = None
+
+    def _base_state(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def load(self, apply):
+        # Feed the catalog to apply(op, data) as ("put", row) / ("delete", product_id)
+        with self.lock:
+            self._base = self._base_state()
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as file:
+                    for line in file:
+                        if line.strip():
+                            apply("put", parse_line(line))
+            if self.journal is not None:
+                self.journal.reopen()
+                self.journal.replay(lambda op, data: apply(op, tuple(data) if op == "put" else data))
+                self._journal_id = journal_id(self.journal.path)
+                self._offset = self.journal.size
+                # A compaction still running elsewhere writes exactly what was just read
+                self._old_id = journal_id(self.journal.old_path)
+
+    def changes(self):
+        # Records other processes saved since this one last loaded or wrote, as
+        # (op, data) like load(); None if they cannot be told apart and the
+        # catalog has to be loaded again. Call it while holding self.lock.
+        if self.journal is None:
+            return [] if self._base_state() == self._base else None
+        old_id = journal_id(self.journal.old_path)
+        records = []
+        if self._journal_id is None:
+            # Nothing followed yet: a journal started since then is read from the
+            # start, unless it has already been rotated away by a compaction
+            if old_id is not None and old_id != self._old_id:
+                return None
+        elif journal_id(self.journal.path) != self._journal_id:
+            # Another process rotated the journal to start a compaction: finish
+            # reading it as .old, then follow the new journal from its start
+            if old_id != self._journal_id:
+                return None
+            records, _ = self.journal.read_from(self.journal.old_path, self._offset)
+            self.journal.reopen()
+            self._journal_id, self._offset, self._old_id = None, 0, old_id
+        base = self._base_state()
+        if base != self._base:
+            # products.txt is only replaced by a compaction, with what was in the journal
+            if self._old_id is None:
+                return None
+            self._base = base
+        if old_id is None:
+            self._old_id = None
+        current = journal_id(self.journal.path)
+        if current is not None:
+            if current != self._journal_id:
+                self.journal.reopen()
+                self._journal_id, self._offset = current, 0
+            more, self._offset = self.journal.read_from(self.journal.path, self._offset)
+            self.journal.records += len(more)
+            self.journal.size = self._offset
+            records += more
+        return [(op, tuple(data) if op == "put" else data) for op, data in records]
+
+    def _up_to_date(self):
+        # True if nobody has written since this process last loaded, wrote or read changes
+        if self._base_state() != self._base:
+            return False
+        if self.journal is None:
+            return True
+        current = journal_id(self.journal.path)
+        return current == self._journal_id and \
+            (current is None or os.path.getsize(self.journal.path) == self._offset)
+
+    def get(self, product_id):
+        # Look up one product by scanning for its line, without loading the catalog
+        prefix = product_id + ","
+        row = None
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.startswith(prefix):
+                        row = parse_line(line)
+        if self.journal is not None:
+            def apply(op, data):
+                nonlocal row
+                if op == "put" and data[0] == product_id:
+                    row = tuple(data)
+                elif op == "delete" and data == product_id:
+                    row = None
+            # Replay into a throwaway journal object so the live one's counters stay untouched
+            ProductJournal(self.journal.path).replay(apply)
+        return row
+
+    def write(self, pending, rewrite, snapshot):
+        # pending: list of ("put", row) / ("delete", product_id) since the last write
+        # rewrite: True if pending edits or deletes existing rows
+        # snapshot: callable returning every current row, used for full rewrites
+        # The caller holds self.lock and has applied changes() first.
+        with self._lock, self.lock:
+            self._snapshot = snapshot
+            if self.journal is not None:
+                # One fsync'd append per write, whatever the catalog size. The file is
+                # closed again so another process can rotate it (Windows refuses to
+                # rename open files).
+                self.journal.append(pending)
+                self.journal.close()
+                if os.path.exists(self.journal.path):
+                    self._journal_id = journal_id(self.journal.path)
+                    self._offset = os.path.getsize(self.journal.path)
+                if self.journal.needs_compaction():
+                    self.compact(background=True)
+            elif rewrite:
+                os.replace(self._write_tmp(snapshot()), self.path)
+                fsync_directory(self.path)
+                self._base = self._base_state()
+            elif pending:
+                # Only new products: append them instead of rewriting the file
+                with open(self.path, "a", encoding="utf-8") as file:
+                    for op, row in pending:
+                        file.write(format_line(row))
+                self._base = self._base_state()
+
+    def _write_tmp(self, rows):
+        # Write to a temporary file to be swapped in, so a crash never leaves a half-written catalog
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            for row in rows:
+                file.write(format_line(row))
+            file.flush()
+            os.fsync(file.fileno())
+        return tmp_path
+
+    def compact(self, background=False):
+        # Fold the journal into a fresh products.txt snapshot
+        if self.journal is None or self._snapshot is None:
+            return
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            # Another process may be compacting already
+            if not self._compaction_lock.acquire(blocking=False):
+                return
+            try:
+                with self.lock:
+                    # The snapshot is only complete if nobody else wrote since our last write
+                    if not self._up_to_date():
+                        self._compaction_lock.release()
+                        return
+                    rows = self._snapshot()
+                    try:
+                        self.journal.rotate()
+                    except PermissionError:
+                        # Another process has the journal open (Windows); try again next time
+                        self._compaction_lock.release()
+                        return
+                    self._journal_id, self._offset = None, 0
+                    self._old_id = journal_id(self.journal.old_path)
+            except BaseException:
+                self._compaction_lock.release()
+                raise
+
+        def run():
+            try:
+                tmp_path = self._write_tmp(rows)
+                with self.lock:
+                    os.replace(tmp_path, self.path)
+                    fsync_directory(self.path)
+                    self.journal.discard_old()
+                    self._base = self._base_state()
+                    self._old_id = None
+            finally:
+                self._compaction_lock.release()
+
+        if background:
+            self._compaction = threading.Thread(target=run, name="product-compaction")
+            self._compaction.start()
+        else:
+            run()
+
+    def fingerprint(self):
+        paths = [self.path]
+        if self.journal is not None:
+            paths += [self.journal.path, self.journal.old_path]
+        return file_fingerprint(paths)
+
+    def close(self, compact=False):
+        # compact=True folds any remaining journal records into products.txt
+        if self._compaction is not None:
+            self._compaction.join()
+        if self.journal is not None:
+            if compact and self.journal.records:
+                self.compact()
+            self.journal.close()
+
+
+class SQLiteStorage:
+    # Products in a SQLite database (WAL mode) with indexed lookups
+    MAX_CHANGES = 100000
+
+    def __init__(self, path="products.db"):
+        self.path = path
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS products ("
+                "product_id TEXT PRIMARY KEY, name TEXT, price TEXT, description TEXT, "
+                "stock_quantity TEXT, category TEXT, date_added TEXT, last_updated TEXT, image_path TEXT)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products (category)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_products_name ON products (name COLLATE NOCASE)")
+            # Every changed product id, in order, so other processes can pick up just those
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS product_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, product_id TEXT)")
+            for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                self.connection.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS log_product_{event.lower()} AFTER {event} ON products "
+                    f"BEGIN INSERT INTO product_changes (product_id) VALUES ({row}.product_id); END")
+            # A product renamed in place is gone under its old id as well
+            self.connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS log_product_rename AFTER UPDATE OF product_id ON products "
+                "WHEN OLD.product_id <> NEW.product_id "
+                "BEGIN INSERT INTO product_changes (product_id) VALUES (OLD.product_id); END")
+        # SQLite serializes the writes themselves; this lock makes "read what others
+        # changed, then write" one step, the same as for the text file
+        self.lock = FileLock(path + ".lock")
+        self._seq = 0  # last change log entry this process has seen
+
+    def load(self, apply):
+        with self._lock, self.lock:
+            self._seq = self._last_seq()
+            for row in self.connection.execute(f"SELECT {', '.join(FIELDS)} FROM products ORDER BY rowid"):
+                apply("put", row)
+
+    def write(self, pending, rewrite=False, snapshot=None):
+        # The whole batch goes in one transaction. Rows keep their rowid, and so
+        # their place in the catalog: upserts update in place, and a product whose
+        # id changed is renamed in place rather than deleted and inserted at the end.
+        if not pending:
+            return
+        with self._lock, self.lock:
+            with self.connection:
+                for index, (op, data) in enumerate(pending):
+                    if op == "put":
+                        self.connection.execute(_UPSERT, data)
+                        continue
+                    new_id = self._renamed_to(pending, index)
+                    if new_id is not None:
+                        self.connection.execute("UPDATE products SET product_id = ? WHERE product_id = ?", (new_id, data))
+                    else:
+                        self.connection.execute("DELETE FROM products WHERE product_id = ?", (data,))
+                self._prune_changes()
+            self._seq = self._last_seq()
+
+    def _renamed_to(self, pending, index):
+        # ProductStore writes an edit that changes the product id as a delete of the
+        # old id followed by a put of the new one; the new id, or None
+        if index + 1 == len(pending):
+            return None
+        op, row = pending[index + 1]
+        if op != "put" or row[0] == pending[index][1] or \
+                self.connection.execute("SELECT 1 FROM products WHERE product_id = ?", (row[0],)).fetchone():
+            return None
+        return row[0]
+
+    def _prune_changes(self):
+        # Keep the newest MAX_CHANGES entries; a process further behind reloads
+        self.connection.execute("DELETE FROM product_changes WHERE seq <= ?", (self._last_seq() - self.MAX_CHANGES,))
+
+    def _last_seq(self):
+        return self.connection.execute("SELECT COALESCE(MAX(seq), 0) FROM product_changes").fetchone()[0]
+
+    def changes(self):
+        # Products other processes changed since this one last loaded or wrote, as
+        # ("put", row) / ("delete", product_id); None if the change log no longer
+        # reaches back that far. Call it while holding self.lock.
+        with self._lock:
+            first = self.connection.execute("SELECT MIN(seq) FROM product_changes").fetchone()[0]
+            if first is not None and first > self._seq + 1:
+                return None
+            changed = self.connection.execute(
+                "SELECT seq, product_id FROM product_changes WHERE seq > ? ORDER BY seq", (self._seq,)).fetchall()
+            if not changed:
+                return []
+            self._seq = changed[-1][0]
+            records = []
+            for product_id in dict.fromkeys(product_id for seq, product_id in changed):
+                row = self.connection.execute(
+                    f"SELECT {', '.join(FIELDS)} FROM products WHERE product_id = ?", (product_id,)).fetchone()
+                records.append(("put", row) if row is not None else ("delete", product_id))
+            return records
+
+    def write_many(self, rows):
+        with self._lock, self.connection:
+            self.connection.executemany(_UPSERT, rows)
+            self._prune_changes()
+
+    # Indexed lookups that do not need the catalog in memory
+
+    def get(self, product_id):
+        with self._lock:
+            return self.connection.execute(
+                f"SELECT {', '.join(FIELDS)} FROM products WHERE product_id = ?", (product_id,)).fetchone()
+
+    def find_by_category(self, category):
+        with self._lock:
+            return self.connection.execute(
+                f"SELECT {', '.join(FIELDS)} FROM products WHERE category = ? ORDER BY rowid", (category,)).fetchall()
+
+    def find_by_name(self, name):
+        # Case-insensitive like ProductStore.find_by_name; NOCASE only folds ASCII letters
+        with self._lock:
+            return self.connection.execute(
+                f"SELECT {', '.join(FIELDS)} FROM products WHERE name = ? COLLATE NOCASE ORDER BY rowid",
+                (name,)).fetchall()
+
+    def fingerprint(self):
+        return file_fingerprint([self.path, self.path + "-wal"])
+
+    def close(self, compact=False):
+        with self._lock:
+            self.connection.close()
+
+
+_UPSERT = (f"INSERT INTO products ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))}) "
+           "ON CONFLICT(product_id) DO UPDATE SET "
+           + ", ".join(f"{field} = excluded.{field}" for field in FIELDS[1:]))
+
+
+def open_storage(path, journal=False):
+    # Pick the backend from the file name: .db/.sqlite -> SQLite, anything else -> text
+    if os.path.splitext(path)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+        return SQLiteStorage(path)
+    return TextFileStorage(path, journal=journal)
+
+
+def migrate_text_to_sqlite(text_path, db_path, batch_size=10000):
+    # One-shot copy of products.txt (plus any journal) into a SQLite database
+    source = TextFileStorage(text_path, journal=os.path.exists(text_path + ".journal"))
+    products = {}
+
+    def apply(op, data):
+        if op == "put":
+            products[data[0]] = data
+        else:
+            products.pop(data, None)
+
+    source.load(apply)
+    target = SQLiteStorage(db_path)
+    rows = list(products.values())
+    for start in range(0, len(rows), batch_size):
+        target.write_many(rows[start:start + batch_size])
+    target.close()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate products.txt into a SQLite database.")
+    parser.add_argument("source", nargs="?", default="products.txt")
+    parser.add_argument("target", nargs="?", default="products.db")
+    args = parser.parse_args()
+    count = migrate_text_to_sqlite(args.source, args.target)
+    print(f"Migrated {count} products from {args.source} to {args.target}")
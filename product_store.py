@@ -0,0 +1,397 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+import metrics
+from product_row import ProductRow
+from product_storage import open_storage
+from search_index import SearchIndex, tokenize
+
+
+class ConflictError(ValueError):
+    # Raised by flush() when another process saved products this one had changed too
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        if len(product_ids) == 1:
+            message = f"Product \"{product_ids[0]}\" was changed by another user."
+        else:
+            message = f"{len(product_ids)} products were changed by another user."
+        super().__init__(message + " Your changes were not saved.")
+
+
+class ProductStore:
+    MAX_CACHED_QUERIES = 256
+
+    def __init__(self, path="products.txt", journal=False, storage=None, index_path=None, cache_ids=1000000):
+        self.path = path
+        # Persistence backend (text file, journaled text file or SQLite)
+        self.storage = storage if storage is not None else open_storage(path, journal=journal)
+        # Primary index: product_id -> ProductRow (dict keeps file order)
+        self.products = {}
+        # Secondary indexes: category -> {product_id: None} (a set that keeps
+        # catalog order, so a category lists in the same order as the catalog)
+        # and lowercase name -> product id, or {product_id: None} once several
+        # products share the name (most names are unique, and a plain string
+        # costs nothing extra)
+        self.by_category = {}
+        self.by_name = {}
+        # Full-text index over id, name, category and description, built on the
+        # first search; saved to index_path on close (if given) for the next load
+        self.index = SearchIndex()
+        self.index_path = index_path
+        self._index_ready = False
+        # Recent search results: (category, query terms) -> ranked product ids, least
+        # recently used first, holding at most cache_ids ids in all. Any change clears it.
+        self._results = OrderedDict()
+        self._cached_ids = 0
+        self.cache_ids = cache_ids
+        # Pending disk work, written out by flush(): ("put", row) / ("delete", product_id)
+        self._pending = []
+        self._rewrite = False
+        self._lock = threading.RLock()
+        # Other processes may share the data files. Products changed here but not
+        # saved yet: product_id -> row as last saved (None if it did not exist),
+        # and those another process saved differently in the meantime
+        self._base = {}
+        self._conflicts = {}
+        # Products other processes changed since the last refresh() (an ordered set),
+        # the storage fingerprint as of the last sync, and a callback that gets
+        # the (old row, new row) pairs of their changes
+        self._changed = {}
+        self._seen = None
+        self.on_change = None
+
+    def load(self):
+        self.products.clear()
+        self.by_category.clear()
+        self.by_name.clear()
+        self._pending = []
+        self._rewrite = False
+        self._base = {}
+        self._conflicts = {}
+        self._index_ready = False
+        self._clear_results()
+        with metrics.timer("storage.load"):
+            self.storage.load(self._apply)
+        self._seen = self.storage.fingerprint()
+        # A saved index is only reused if it was written for exactly these data files
+        self._index_ready = bool(self.index_path) and self.index.load(self.index_path, self.storage.fingerprint())
+
+    def _apply(self, op, data):
+        if op == "put":
+            self._put(data)
+        elif op == "delete" and data in self.products:
+            self._unindex(self.products.pop(data))
+
+    def _put(self, row):
+        if not isinstance(row, ProductRow):
+            row = ProductRow(row)
+        old_row = self.products.get(row.product_id)
+        if old_row is not None:
+            self._unindex(old_row, keep_category=old_row.category == row.category)
+        self.products[row.product_id] = row
+        self._index(row)
+
+    def _name_key(self, name):
+        # Reuse the name itself when it is already lowercase
+        key = name.lower()
+        return name if key == name else key
+
+    def _index(self, row):
+        self.by_category.setdefault(row.category, {})[row.product_id] = None
+        key = self._name_key(row.name)
+        ids = self.by_name.get(key)
+        if ids is None:
+            self.by_name[key] = row.product_id
+        elif isinstance(ids, str):
+            self.by_name[key] = {ids: None, row.product_id: None}
+        else:
+            ids[row.product_id] = None
+        if self._index_ready:
+            self.index.add(row)
+
+    def _unindex(self, row, keep_category=False):
+        # keep_category leaves the product in its category, in the same place,
+        # for an update that does not change the category
+        ids = self.by_category.get(row.category)
+        if ids is not None and not keep_category:
+            ids.pop(row.product_id, None)
+            if not ids:
+                del self.by_category[row.category]
+        key = self._name_key(row.name)
+        ids = self.by_name.get(key)
+        if isinstance(ids, str):
+            if ids == row.product_id:
+                del self.by_name[key]
+        elif ids is not None:
+            ids.pop(row.product_id, None)
+            if len(ids) == 1:
+                self.by_name[key] = next(iter(ids))
+        if self._index_ready:
+            self.index.remove(row.product_id)
+
+    def __len__(self):
+        return len(self.products)
+
+    def __contains__(self, product_id):
+        return product_id in self.products
+
+    def get(self, product_id):
+        return self.products.get(product_id)
+
+    def rows(self):
+        return iter(self.products.values())
+
+    def find_by_category(self, category):
+        return [self.products[pid] for pid in self.by_category.get(category, ())]
+
+    def category_ids(self, category):
+        return list(self.by_category.get(category, ()))
+
+    def category_counts(self):
+        # category -> number of products, for every category in use
+        return {category: len(ids) for category, ids in self.by_category.items()}
+
+    def find_by_name(self, name):
+        ids = self.by_name.get(name.lower(), ())
+        return [self.products[pid] for pid in ((ids,) if isinstance(ids, str) else ids)]
+
+    def ids(self):
+        return list(self.products)
+
+    def search_ids(self, query, limit=None, category=None):
+        # Ranked full-text search; every word of the query must match the start of a word.
+        # An empty query matches every product (or every product in category), in catalog order.
+        terms = tuple(sorted(set(tokenize(query))))
+        members = None if category is None else self.by_category.get(category, {})
+        if not terms:
+            return list(itertools.islice(self.products if members is None else members, limit))
+        self._ensure_index()
+        key = (category, terms)
+        ids = self._results.get(key)
+        if ids is not None:
+            self._results.move_to_end(key)
+            metrics.count("search.cache_hits")
+        else:
+            metrics.count("search.cache_misses")
+            # A query that only adds words to an earlier one, or makes its words
+            # longer, matches a subset of that result, so only the subset is searched.
+            # A category filter limits the search to the products in it the same way.
+            within = self._broader_result(category, terms)
+            if within is None:
+                within = members
+            if within is None and limit is not None:
+                return self.index.search(query, limit)
+            ids = self.index.search(query, within=within)
+            self._cache_result(key, ids)
+        # A cached Ranking is read-only and can be shared; a list is copied so
+        # callers can change it without touching the cache
+        if limit is None and not isinstance(ids, list):
+            return ids
+        return ids[:limit]
+
+    def _broader_result(self, category, terms):
+        best = None
+        for (cached_category, cached_terms), ids in self._results.items():
+            if cached_category == category and (best is None or len(ids) < len(best)) and \
+                    all(any(term.startswith(cached) for term in terms) for cached in cached_terms):
+                best = ids
+        return best
+
+    def _cache_result(self, key, ids):
+        if len(ids) > self.cache_ids:
+            return
+        self._results[key] = ids
+        self._cached_ids += len(ids)
+        while self._cached_ids > self.cache_ids or len(self._results) > self.MAX_CACHED_QUERIES:
+            _, evicted = self._results.popitem(last=False)
+            self._cached_ids -= len(evicted)
+
+    def _clear_results(self):
+        self._results.clear()
+        self._cached_ids = 0
+
+    def _ensure_index(self):
+        if not self._index_ready:
+            with self._lock, metrics.timer("search.build_index"):
+                self.index.clear()
+                for row in self.products.values():
+                    self.index.add(row)
+                self._index_ready = True
+
+    def search(self, query, limit=None):
+        return [self.products[pid] for pid in self.search_ids(query, limit)]
+
+    def add(self, row):
+        row = tuple(row)
+        if row[0] in self.products:
+            raise ValueError(f"Product ID \"{row[0]}\" already exists.")
+        with self._lock:
+            product = self.products[row[0]] = ProductRow(row)
+            self._index(product)
+            self._clear_results()
+            self._base.setdefault(row[0], None)
+            self._pending.append(("put", row))
+
+    def update(self, old_product_id, row, expected=None):
+        # expected: the product as the caller last read it (say, into an edit form);
+        # if it has changed since, ConflictError is raised and nothing changes
+        row = tuple(row)
+        old_row = self.products.get(old_product_id)
+        if old_row is None:
+            raise KeyError(old_product_id)
+        if expected is not None and old_row != expected:
+            raise ConflictError([old_product_id])
+        if row[0] != old_product_id and row[0] in self.products:
+            raise ValueError(f"Product ID \"{row[0]}\" already exists.")
+        with self._lock:
+            product = ProductRow(row)
+            same_category = old_row.category == product.category
+            self._unindex(old_row, keep_category=same_category)
+            if row[0] == old_product_id:
+                self.products[old_product_id] = product
+            else:
+                # Rebuild the dicts so the renamed product keeps its position
+                self.products = {(row[0] if pid == old_product_id else pid): (product if pid == old_product_id else value)
+                                 for pid, value in self.products.items()}
+                if same_category:
+                    self.by_category[product.category] = {
+                        (row[0] if pid == old_product_id else pid): None for pid in self.by_category[product.category]}
+                self._pending.append(("delete", old_product_id))
+                self._base.setdefault(row[0], None)
+            self._base.setdefault(old_product_id, old_row)
+            self._index(product)
+            self._clear_results()
+            self._pending.append(("put", row))
+            self._rewrite = True
+        return old_row
+
+    def delete(self, product_id):
+        with self._lock:
+            row = self.products.pop(product_id, None)
+            if row is None:
+                raise KeyError(product_id)
+            self._unindex(row)
+            self._clear_results()
+            self._base.setdefault(product_id, row)
+            self._pending.append(("delete", product_id))
+            self._rewrite = True
+        return row
+
+    def flush(self):
+        # Save pending changes. Whatever other processes saved first is applied
+        # before; if they changed the same products, ConflictError is raised and
+        # the pending changes are dropped.
+        with self._lock, self.storage.lock:
+            self._catch_up()
+            if self._conflicts:
+                metrics.count("storage.conflicts")
+                self._drop_pending()
+            pending, self._pending = self._pending, []
+            rewrite, self._rewrite = self._rewrite, False
+            with metrics.timer("storage.write"):
+                self.storage.write(pending, rewrite, self._snapshot)
+            self._base = {}
+            self._seen = self.storage.fingerprint()
+
+    def refresh(self):
+        # Apply what other processes saved since the last sync. Returns the ids of
+        # the products they changed since the last call (also those flush() applied).
+        if self.storage.fingerprint() != self._seen:
+            with self._lock, self.storage.lock:
+                self._catch_up()
+        with self._lock:
+            changed, self._changed = list(self._changed), {}
+        return changed
+
+    def _catch_up(self):
+        # Products with unsaved changes here are left alone; if another process
+        # saved them differently they become conflicts for flush()
+        with metrics.timer("storage.changes"):
+            records = self.storage.changes()
+            if records is None:
+                metrics.count("storage.reloads")
+                saved = self._reload_changes()
+            else:
+                saved = self._saved_rows(records)
+        changes = []
+        for product_id, row in saved.items():
+            if product_id not in self._base:
+                changes.append(self._replace(product_id, row))
+            elif row != self._base[product_id]:
+                self._conflicts[product_id] = row
+        self._seen = self.storage.fingerprint()
+        self._notify(changes)
+
+    def _saved_rows(self, records):
+        # product_id -> ProductRow as last saved by another process, or None if deleted
+        saved = {}
+        for op, data in records:
+            if op == "put":
+                saved[data[0]] = ProductRow(data)
+            else:
+                saved[data] = None
+        return saved
+
+    def _reload_changes(self):
+        # The same, when the storage cannot tell what changed: load everything
+        # again and compare it with the rows as this process last saw them saved
+        rows = {}
+
+        def apply(op, data):
+            if op == "put":
+                rows[data[0]] = data
+            else:
+                rows.pop(data, None)
+
+        self.storage.load(apply)
+        saved = {}
+        for product_id, row in rows.items():
+            row = ProductRow(row)
+            if row != self._last_saved(product_id):
+                saved[product_id] = row
+        for product_id in itertools.chain(self.products, self._base):
+            if product_id not in rows and self._last_saved(product_id) is not None:
+                saved[product_id] = None
+        return saved
+
+    def _last_saved(self, product_id):
+        return self._base[product_id] if product_id in self._base else self.products.get(product_id)
+
+    def _replace(self, product_id, row):
+        # Make row (None: no product) the product_id product; returns (old row, new row)
+        old_row = self.products.get(product_id)
+        if row is not None:
+            self._put(row)
+        elif old_row is not None:
+            self._unindex(self.products.pop(product_id))
+        self._changed[product_id] = None
+        return old_row, row
+
+    def _notify(self, changes):
+        if changes:
+            self._clear_results()
+            if self.on_change is not None:
+                self.on_change(changes)
+
+    def _drop_pending(self):
+        # Put back the rows as they were saved, then take the other process's versions
+        conflicts, self._conflicts = self._conflicts, {}
+        base, self._base = self._base, {}
+        self._pending = []
+        self._rewrite = False
+        self._clear_results()
+        for product_id, row in base.items():
+            self._replace(product_id, row)
+        self._notify([self._replace(product_id, row) for product_id, row in conflicts.items()])
+        raise ConflictError(list(conflicts))
+
+    def _snapshot(self):
+        with self._lock:
+            return list(self.products.values())
+
+    def close(self, compact=False):
+        self.flush()
+        self.storage.close(compact)
+        if self.index_path and self._index_ready:
+            self.index.save(self.index_path, self.storage.fingerprint())
@@ -0,0 +1,164 @@
+import tkinter as tk
+from tkinter import ttk
+
+import metrics
+from search_index import Ranking
+
+
+class ProductTable:
+    # A Treeview that only holds the rows currently on screen. The full result
+    # set is a list of product ids; rows are fetched on demand as the user
+    # scrolls, and each redraw updates the existing items instead of
+    # deleting and reinserting them.
+    def __init__(self, parent, columns, fetch, page_size=10):
+        self.fetch = fetch  # product_id -> row values (or None)
+        self.page_size = page_size
+        self.ids = []
+        self.offset = 0
+        self._rendered = {}  # product_id -> values currently shown
+        self._selected = set()
+
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", height=page_size, selectmode="extended")
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll(-1 if event.delta > 0 else 1) or "break")
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-1) or "break")
+        self.tree.bind("<Button-5>", lambda event: self.scroll(1) or "break")
+        self.tree.bind("<Prior>", lambda event: self.scroll(-self.page_size) or "break")
+        self.tree.bind("<Next>", lambda event: self.scroll(self.page_size) or "break")
+        self.tree.bind("<Up>", lambda event: self._on_arrow(-1))
+        self.tree.bind("<Down>", lambda event: self._on_arrow(1))
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+
+    def set_ids(self, ids, keep_offset=False):
+        # Show a new result set; selected products that are no longer in it are dropped
+        # A search Ranking is kept as it is, so only the rows scrolled to get sorted
+        self.ids = ids if isinstance(ids, (list, Ranking)) else list(ids)
+        if not keep_offset:
+            self.offset = 0
+        if self._selected:
+            members = self.ids if isinstance(self.ids, Ranking) else set(self.ids)
+            self._selected = {product_id for product_id in self._selected if product_id in members}
+        self.render()
+
+    def _editable_ids(self):
+        # A Ranking is read-only; edits to the shown list work on a copy of it
+        if not isinstance(self.ids, list):
+            self.ids = list(self.ids)
+        return self.ids
+
+    def append(self, product_id):
+        self._editable_ids().append(product_id)
+        self.render()
+
+    def replace(self, old_product_id, new_product_id):
+        # Redraw a product in place after it was edited (possibly with a new id)
+        if old_product_id != new_product_id:
+            try:
+                ids = self._editable_ids()
+                ids[ids.index(old_product_id)] = new_product_id
+            except ValueError:
+                return
+            if old_product_id in self._selected:
+                self._selected.discard(old_product_id)
+                self._selected.add(new_product_id)
+        self.render()
+
+    def remove(self, product_id):
+        try:
+            self._editable_ids().remove(product_id)
+        except ValueError:
+            return
+        self._selected.discard(product_id)
+        self.render()
+
+    def remove_many(self, product_ids):
+        # Remove several products with a single redraw
+        removed = set(product_ids)
+        self.ids = [product_id for product_id in self.ids if product_id not in removed]
+        self._selected -= removed
+        self.render()
+
+    def selection(self):
+        # Selected product ids in display order, including rows scrolled out of view
+        if len(self._selected) <= 1:
+            return list(self._selected)
+        return [product_id for product_id in self.ids if product_id in self._selected]
+
+    def clear_selection(self):
+        self._selected.clear()
+        self.tree.selection_set(())
+
+    def scroll(self, rows):
+        self.offset += rows
+        self.render()
+
+    def render(self):
+        # Treeview updates are timed separately from the work that produced the ids
+        with metrics.timer("table.render"):
+            self._render()
+
+    def _render(self):
+        self.offset = max(0, min(self.offset, len(self.ids) - self.page_size))
+        window = []
+        for product_id in self.ids[self.offset:self.offset + self.page_size]:
+            values = self.fetch(product_id)
+            if values is not None:
+                window.append((product_id, tuple(values)))
+        window_ids = {product_id for product_id, _ in window}
+
+        # Drop rows that scrolled out, then update, move or insert the rest
+        stale = [item for item in self.tree.get_children() if item not in window_ids]
+        if stale:
+            self.tree.delete(*stale)
+            for item in stale:
+                self._rendered.pop(item, None)
+        for index, (product_id, values) in enumerate(window):
+            if product_id not in self._rendered:
+                self.tree.insert("", index, iid=product_id, values=values)
+            else:
+                if self._rendered[product_id] != values:
+                    self.tree.item(product_id, values=values)
+                if self.tree.index(product_id) != index:
+                    self.tree.move(product_id, "", index)
+            self._rendered[product_id] = values
+
+        self.tree.selection_set([product_id for product_id in window_ids if product_id in self._selected])
+        total = len(self.ids)
+        if total <= self.page_size:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.page_size) / total)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.ids))
+            self.render()
+        elif action == "scroll":
+            self.scroll(int(amount) * (self.page_size if unit == "pages" else 1))
+
+    def _on_arrow(self, step):
+        # Scroll when the keyboard focus moves past the first or last visible row
+        children = self.tree.get_children()
+        if not children or self.tree.focus() != (children[0] if step < 0 else children[-1]):
+            return None
+        self.scroll(step)
+        children = self.tree.get_children()
+        target = children[0] if step < 0 else children[-1]
+        self._selected = {target}
+        self.tree.focus(target)
+        self.tree.selection_set(target)
+        return "break"
+
+    def _on_click(self, event):
+        # A plain click starts a new selection, also for rows scrolled out of view
+        if not event.state & 0x0005:  # Shift or Control
+            self._selected.clear()
+
+    def _on_select(self, event):
+        visible = set(self.tree.get_children())
+        self._selected = (self._selected - visible) | set(self.tree.selection())
@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Sampling profiler for the running application. Every few milliseconds it
+# records the Python stack of every thread, so the Tk thread and the catalog
+# worker are both covered (cProfile only sees the thread that started it) and
+# the application slows down very little.
+#
+# Samples are written as folded stacks ("thread;outer;...;inner count" per
+# line), which flamegraph.pl and speedscope.app read directly.
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()  # folded stack -> number of samples
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.started = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.elapsed += time.perf_counter() - self.started
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, limit=20):
+        # (function, samples spent in it, samples with it anywhere on the stack), busiest first
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [(frame, samples, total[frame]) for frame, samples in own.most_common(limit)]
+
+    def report(self, limit=20):
+        lines = [f"{self.samples} samples over {self.elapsed:.1f} s, every {self.interval * 1000:g} ms",
+                 f"{'own':>7} {'total':>7}  function"]
+        for frame, samples, total in self.top(limit):
+            lines.append(f"{samples:>7} {total:>7}  {frame}")
+        return "\n".join(lines)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
@@ -0,0 +1,206 @@
+import bisect
+import heapq
+import json
+import os
+import re
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Row column -> ranking weight. Matches in the ID or name count more than
+# matches in the category, which count more than the description.
+FIELD_WEIGHTS = {0: 4, 1: 3, 5: 2, 3: 1}
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class Ranking:
+    # Search result ids, best match first, ranked lazily: a heap picks the first
+    # page and the rest is only sorted when something reads past it (the table
+    # scrolling down), so a broad query does not sort every match up front.
+    # Read-only; list(ranking) gives a list that can be changed.
+    FIRST_PAGE = 100
+
+    def __init__(self, scores):
+        self.scores = scores  # product_id -> score
+        self._ranked = heapq.nsmallest(self.FIRST_PAGE, scores, key=self._key)
+
+    def _key(self, product_id):
+        return -self.scores[product_id], product_id
+
+    def _rank(self, count):
+        # Make sure at least the first count ids are in order
+        if count <= len(self._ranked) or len(self._ranked) == len(self.scores):
+            return
+        count = max(count, 2 * len(self._ranked))
+        if count < len(self.scores) // 4:
+            self._ranked = heapq.nsmallest(count, self.scores, key=self._key)
+        else:
+            self._ranked = sorted(self.scores, key=self._key)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __contains__(self, product_id):
+        return product_id in self.scores
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self.scores))
+            self._rank(max(start, stop))
+        else:
+            self._rank(len(self.scores) if index < 0 else index + 1)
+        return self._ranked[index]
+
+    def __iter__(self):
+        self._rank(len(self.scores))
+        return iter(self._ranked)
+
+
+class SearchIndex:
+    def __init__(self):
+        # token -> {product_id: weight}
+        self.postings = {}
+        # product_id -> {token: weight}, needed to remove a product again
+        self.documents = {}
+        # Every token in sorted order, for prefix lookups with bisect. New tokens
+        # wait in _new_tokens and are merged in on the next search, so bulk loads
+        # sort once instead of inserting one token at a time.
+        self.tokens = []
+        self._new_tokens = []
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, row):
+        product_id = row[0]
+        if product_id in self.documents:
+            self.remove(product_id)
+        weights = {}
+        for column, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row[column]):
+                weights[token] = weights.get(token, 0) + weight
+        self._add_document(product_id, weights)
+
+    def _add_document(self, product_id, weights):
+        self.documents[product_id] = weights
+        for token, weight in weights.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = {}
+                self._new_tokens.append(token)
+            postings[product_id] = weight
+
+    def remove(self, product_id):
+        weights = self.documents.pop(product_id, None)
+        if weights is None:
+            return
+        for token in weights:
+            postings = self.postings[token]
+            del postings[product_id]
+            if not postings:
+                del self.postings[token]
+                index = bisect.bisect_left(self.tokens, token)
+                if index < len(self.tokens) and self.tokens[index] == token:
+                    del self.tokens[index]
+                else:
+                    self._new_tokens.remove(token)
+
+    def clear(self):
+        self.postings.clear()
+        self.documents.clear()
+        self.tokens = []
+        self._new_tokens = []
+
+    def _merge_new_tokens(self):
+        if len(self._new_tokens) < 64:
+            for token in self._new_tokens:
+                bisect.insort(self.tokens, token)
+        else:
+            self.tokens.extend(self._new_tokens)
+            self.tokens.sort()
+        self._new_tokens = []
+
+    def _expand(self, term):
+        # Tokens starting with term; an exact match is always first
+        if self._new_tokens:
+            self._merge_new_tokens()
+        start = bisect.bisect_left(self.tokens, term)
+        end = start
+        while end < len(self.tokens) and self.tokens[end].startswith(term):
+            end += 1
+        return self.tokens[start:end]
+
+    def search(self, query, limit=None, within=None):
+        # Every query term must match (as a prefix) somewhere in the product.
+        # Returns a Ranking of product ids (a list when limit is given); None means
+        # "no terms, show everything". within limits the search to those product
+        # ids (e.g. an earlier, broader result).
+        terms = tokenize(query)
+        if not terms:
+            return None
+        if isinstance(within, Ranking):
+            within = within.scores
+        scores = None if within is None else dict.fromkeys(within, 0)
+        # Rarest terms first so the candidate set shrinks as fast as possible
+        expansions = sorted((self._expand(term) for term in set(terms)),
+                            key=lambda tokens: sum(len(self.postings[token]) for token in tokens))
+        for tokens in expansions:
+            term_scores = {}
+            for token in tokens:
+                # Whole-word matches rank above prefix matches
+                bonus = 2 if token in terms else 1
+                postings = self.postings[token]
+                if not term_scores:
+                    # First token of the term: build its scores in one pass (a dict
+                    # comprehension is several times faster than get/set per product)
+                    if scores is None:
+                        term_scores = {product_id: weight * bonus for product_id, weight in postings.items()}
+                    else:
+                        # The set intersection runs in C, so only matches are touched in Python
+                        common = scores.keys() & postings.keys() if len(scores) < len(postings) else \
+                            postings.keys() & scores.keys()
+                        term_scores = {product_id: scores[product_id] + postings[product_id] * bonus
+                                       for product_id in common}
+                elif scores is None:
+                    for product_id, weight in postings.items():
+                        term_scores[product_id] = term_scores.get(product_id, 0) + weight * bonus
+                elif len(postings) > len(scores):
+                    # Probe the (smaller) candidate set instead of walking the postings
+                    for product_id, score in scores.items():
+                        weight = postings.get(product_id)
+                        if weight:
+                            term_scores[product_id] = term_scores.get(product_id, score) + weight * bonus
+                else:
+                    for product_id, weight in postings.items():
+                        score = scores.get(product_id)
+                        if score is not None:
+                            term_scores[product_id] = term_scores.get(product_id, score) + weight * bonus
+            scores = term_scores
+            if not scores:
+                return []
+        if limit is not None:
+            return heapq.nsmallest(limit, scores, key=lambda product_id: (-scores[product_id], product_id))
+        return Ranking(scores)
+
+    def save(self, path, fingerprint):
+        # fingerprint identifies the data files the index was built from
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"fingerprint": fingerprint, "documents": self.documents}, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, path, fingerprint):
+        # Returns False (and leaves the index empty) if the saved index is missing or stale
+        self.clear()
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if data.get("fingerprint") != fingerprint:
+            return False
+        for product_id, weights in data["documents"].items():
+            self._add_document(product_id, weights)
+        return True
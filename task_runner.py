@@ -0,0 +1,132 @@
+import queue
+import sys
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import metrics
+
+# Returned by tasks that were skipped because a newer task with the same key came in
+STALE = object()
+
+
+class TaskRunner:
+    # Runs slow catalog work on a background thread so Tk callbacks return at
+    # once. Results come back through a queue that the Tk thread polls with
+    # root.after, so on_done/on_error always run on the Tk thread.
+    #
+    # With a single worker (the default) tasks run one at a time in the order
+    # they were submitted, so the catalog is never changed from two threads.
+    def __init__(self, root, workers=1, poll_ms=20, on_busy=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy  # called with True/False when work starts/finishes
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-task")
+        self.results = queue.Queue()
+        self.running = 0
+        self.busy = 0  # running tasks that were not submitted quiet
+        self.generations = {}  # key -> number of the newest task submitted with that key
+        self._polling = False
+
+    def submit(self, function, *args, on_done=None, on_error=None, key=None, quiet=False, name=None):
+        # Tasks sharing a key cancel each other: an older one that has not
+        # started is skipped, and the result of one that has is dropped.
+        # quiet tasks (routine background checks) do not count as busy.
+        # A named task is timed in metrics: name.wait (queued), name.worker
+        # (running), name.ui (on_done/on_error) and name (all of it).
+        generation = None if key is None else self.claim(key)
+        submitted = time.perf_counter()
+
+        def run():
+            if self.is_stale(key, generation):
+                return STALE
+            if name is None:
+                return function(*args)
+            metrics.observe(name + ".wait", time.perf_counter() - submitted)
+            with metrics.timer(name + ".worker"):
+                return function(*args)
+
+        future = self.executor.submit(run)
+        self.running += 1
+        if not quiet:
+            self.busy += 1
+            if self.busy == 1 and self.on_busy is not None:
+                self.on_busy(True)
+        task = (key, generation, on_done, on_error, quiet, name, submitted)
+        future.add_done_callback(lambda future: self.results.put((future, task)))
+        self._start_polling()
+        return future
+
+    def claim(self, key):
+        # Make earlier tasks with key stale without submitting one; returns the
+        # generation to pass to is_stale later
+        generation = self.generations[key] = self.generations.get(key, 0) + 1
+        return generation
+
+    def is_stale(self, key, generation):
+        return key is not None and self.generations.get(key) != generation
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                future, task = self.results.get_nowait()
+            except queue.Empty:
+                break
+            quiet = task[4]
+            self.running -= 1
+            if not quiet:
+                self.busy -= 1
+            try:
+                self._finish(future, *task)
+            except Exception:
+                self.root.report_callback_exception(*sys.exc_info())
+            if not quiet and self.busy == 0 and self.on_busy is not None:
+                self.on_busy(False)
+
+        if self.running:
+            self.root.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def _finish(self, future, key, generation, on_done, on_error, quiet, name, submitted):
+        try:
+            result = future.result()
+        except CancelledError:
+            return
+        except Exception as e:
+            failed = True
+            error = e
+            if on_error is not None:
+                callback = lambda: on_error(error)
+            else:
+                callback = lambda: self.root.report_callback_exception(type(error), error, error.__traceback__)
+        else:
+            if result is STALE or self.is_stale(key, generation):
+                if name is not None:
+                    metrics.count(name + ".stale")
+                return
+            failed = False
+            callback = (lambda: on_done(result)) if on_done is not None else None
+        if name is None:
+            if callback is not None:
+                callback()
+            return
+        started = time.perf_counter()
+        try:
+            if callback is not None:
+                callback()
+        except Exception:
+            failed = True
+            raise
+        finally:
+            finished = time.perf_counter()
+            metrics.observe(name + ".ui", finished - started, failed)
+            metrics.observe(name, finished - submitted, failed)
+
+    def shutdown(self):
+        # Let queued work (such as pending saves) finish, then stop the worker
+        self.executor.shutdown(wait=True)
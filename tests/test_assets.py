@@ -0,0 +1,88 @@
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assets import AssetManager
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+ICON = b"icon bytes"
+LOGO = b"logo bytes"
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Serves /icon and /logo with a fixed ETag and answers matching conditional requests with 304
+    requests = []
+
+    def do_GET(self):
+        etag = '"' + self.path.strip("/") + '-1"'
+        Handler.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = ICON if self.path == "/icon" else LOGO
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipIf(requests is None, "requests is not installed")
+class AssetRefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="assets_")
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}"
+        Handler.requests = []
+        self.assets = AssetManager(self.folder, {
+            "icon.ico": {"url": url + "/icon", "sha256": hashlib.sha256(ICON).hexdigest()},
+            "logo.png": {"url": url + "/logo"},
+        })
+
+    def refresh(self):
+        thread = self.assets.refresh_async()
+        if thread is not None:
+            thread.join()
+        self.assertEqual(self.assets.errors, {})
+        requests, Handler.requests = Handler.requests, []
+        return sorted(requests)
+
+    def read(self, name):
+        with open(self.assets.path(name), "rb") as file:
+            return file.read()
+
+    def test_refresh(self):
+        self.assertEqual(self.refresh(), [("/icon", None), ("/logo", None)])
+        # The checksummed icon is checked locally; the logo is revalidated with its ETag
+        self.assertEqual(self.refresh(), [("/logo", '"logo-1"')])
+        self.assertEqual(self.read("logo.png"), LOGO)
+
+    def test_damaged_copy_is_downloaded_again(self):
+        self.refresh()
+        with open(self.assets.path("icon.ico"), "wb") as file:
+            file.write(b"damaged")
+        self.assertEqual(self.refresh(), [("/icon", None), ("/logo", '"logo-1"')])
+        self.assertEqual(self.read("icon.ico"), ICON)
+
+
+if __name__ == "__main__":
+    unittest.main()
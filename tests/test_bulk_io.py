@@ -0,0 +1,39 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import Catalog
+
+
+class ImportUpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="bulk_io_")
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.folder)
+        self.catalog = Catalog("products.txt", "category.txt", "images")
+        self.addCleanup(self.catalog.close)
+        self.catalog.ensure_files()
+        with open("shirt.jpg", "wb") as file:
+            file.write(b"not really a jpeg")
+        self.catalog.add_product("P1", "Blue T-Shirt", "9.99", "Cotton", "10", "Clothing", "shirt.jpg")
+        self.image = self.catalog.get("P1")[8]
+
+    def test_feed_without_image_column_keeps_image(self):
+        with open("feed.csv", "w", encoding="utf-8") as file:
+            file.write("product_id,name,price,description,stock_quantity,category\n")
+            file.write("P1,Blue T-Shirt,8.99,Cotton,4,Clothing\n")
+        report = self.catalog.import_file("feed.csv")
+        self.assertEqual(report.updated, 1)
+        row = self.catalog.get("P1")
+        self.assertEqual((row[2], row[4], row[8]), ("8.99", "4", self.image))
+        self.catalog.images.collect_garbage()
+        self.assertTrue(os.path.isfile(self.image))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from product_journal import ProductJournal
+
+
+class TornJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="product_journal_")
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.path = os.path.join(self.folder, "products.txt.journal")
+        journal = ProductJournal(self.path)
+        journal.append([("put", ["P1", "A"])])
+        journal.close()
+        self.offset = os.path.getsize(self.path)
+        # A crash in the middle of writing the next record
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write('{"op": "put", "data": ["P2", "B"')
+
+    def replay(self):
+        records = []
+        ProductJournal(self.path).replay(lambda op, data: records.append((op, data)))
+        return records
+
+    def test_record_after_torn_line_is_kept(self):
+        journal = ProductJournal(self.path)
+        journal.append([("put", ["P3", "C"])])
+        journal.close()
+        self.assertEqual(self.replay(), [("put", ["P1", "A"]), ("put", ["P3", "C"])])
+
+    def test_follower_reads_record_after_torn_line(self):
+        journal = ProductJournal(self.path)
+        records, offset = journal.read_from(self.path, self.offset)
+        self.assertEqual((records, offset), ([], self.offset))
+        journal.append([("delete", "P1")])
+        journal.close()
+        records, offset = journal.read_from(self.path, offset)
+        self.assertEqual(records, [("delete", "P1")])
+        self.assertEqual(offset, os.path.getsize(self.path))
+
+    def test_torn_first_line_gets_a_new_header(self):
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write('{"op": "jour')
+        journal = ProductJournal(self.path)
+        journal.append([("put", ["P3", "C"])])
+        journal.close()
+        self.assertEqual(self.replay(), [("put", ["P3", "C"])])
+
+
+if __name__ == "__main__":
+    unittest.main()
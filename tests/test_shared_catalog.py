@@ -0,0 +1,92 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import Catalog
+from product_store import ConflictError
+
+# Two Catalog objects on the same files stand in for two running instances
+
+
+class SharedCatalogTest(unittest.TestCase):
+    products_file = "products.txt"
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="shared_catalog_")
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        # A new .db is filled from products.txt in the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.folder)
+        self.first = self.open()
+        self.first.ensure_files()
+        self.first.add_product("P1", "Blue T-Shirt", "9.99", "Cotton", "10", "Clothing")
+        self.first.add_product("P2", "Novel", "12.50", "Paperback", "3", "Books")
+        self.second = self.open()
+        self.second.ids()
+
+    def open(self):
+        catalog = Catalog(os.path.join(self.folder, self.products_file), os.path.join(self.folder, "category.txt"),
+                          os.path.join(self.folder, "images"))
+        self.addCleanup(catalog.close)
+        return catalog
+
+    def test_refresh_picks_up_changes(self):
+        self.first.edit_product("P1", "P1", "Blue T-Shirt", "9.99", "Cotton", "0", "Clothing")
+        self.first.add_product("P3", "Kettle", "25.00", "Steel", "4", "Electronics")
+        self.first.delete_product("P2")
+        self.assertEqual(sorted(self.second.refresh()), ["P1", "P2", "P3"])
+        self.assertEqual(self.second.get("P1")[4], "0")
+        self.assertIsNone(self.second.get("P2"))
+        self.assertEqual(self.second.get("P3")[1], "Kettle")
+        self.assertEqual(self.second.refresh(), [])
+
+    def test_edit_of_same_product_conflicts(self):
+        self.first.edit_product("P1", "P1", "Blue T-Shirt", "9.99", "Cotton", "0", "Clothing")
+        with self.assertRaises(ConflictError):
+            self.second.edit_product("P1", "P1", "Red T-Shirt", "9.99", "Cotton", "10", "Clothing")
+        self.assertEqual(tuple(self.second.get("P1")), tuple(self.first.get("P1")))
+
+    def test_edit_from_stale_form_conflicts(self):
+        # The clerk loads P1 into the form, then the other change arrives by polling
+        form = self.second.get("P1")
+        self.first.edit_product("P1", "P1", "Blue T-Shirt", "9.99", "Cotton", "0", "Clothing")
+        self.second.refresh()
+        with self.assertRaises(ConflictError):
+            self.second.edit_product("P1", "P1", "Blue T-Shirt", "9.99", "Cotton", "10", "Clothing", expected=form)
+        self.assertEqual(self.open().get("P1")[4], "0")
+
+    def test_edits_of_different_products_both_saved(self):
+        self.first.edit_product("P1", "P1", "Blue T-Shirt", "8.99", "Cotton", "10", "Clothing")
+        self.second.edit_product("P2", "P2", "Novel", "11.00", "Paperback", "3", "Books")
+        fresh = self.open()
+        self.assertEqual(fresh.get("P1")[2], "8.99")
+        self.assertEqual(fresh.get("P2")[2], "11.00")
+
+    def test_refresh_follows_compaction(self):
+        journal = getattr(self.first.store.storage, "journal", None)
+        if journal is None:
+            self.skipTest("no journal")
+        journal.max_records = 3
+        for i in range(20):
+            self.first.add_product(f"N{i}", f"Item {i}", "1.00", "Test", "1", "Toys")
+            if i % 4 == 0:
+                self.second.refresh()
+        compaction = self.first.store.storage._compaction
+        if compaction is not None:
+            compaction.join()
+        self.second.refresh()
+        self.assertEqual(sorted(self.second.ids()), sorted(self.first.ids()))
+        self.first.close(compact=True)
+        self.assertEqual(sorted(self.open().ids()), sorted(self.second.ids()))
+
+
+class SharedSQLiteTest(SharedCatalogTest):
+    products_file = "products.db"
+
+
+if __name__ == "__main__":
+    unittest.main()
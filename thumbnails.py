@@ -0,0 +1,85 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+from PIL import Image, ImageTk
+
+import metrics
+
+THUMBNAIL_SIZE = (200, 200)
+
+
+class ThumbnailCache:
+    # Product images are scaled down once and saved as small PNGs in
+    # cache_dir, keyed by source path, size and modification time. The
+    # PhotoImages built from them are kept in an LRU bounded by max_bytes.
+    def __init__(self, cache_dir=os.path.join("images", ".thumbnails"), max_bytes=32 * 1024 * 1024, size=THUMBNAIL_SIZE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.size = size
+        self.photos = OrderedDict()  # key -> (PhotoImage, bytes)
+        self.bytes = 0
+
+    def _key(self, path):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def thumbnail_path(self, key):
+        name = hashlib.sha1(f"{key[0]}|{key[1]}|{key[2]}|{self.size}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, name + ".png")
+
+    def thumbnail(self, path, key=None):
+        # PIL image of the thumbnail, generated and saved on first use
+        key = key or self._key(path)
+        thumbnail_path = self.thumbnail_path(key)
+        if os.path.exists(thumbnail_path):
+            try:
+                with metrics.timer("thumbnails.read"):
+                    image = Image.open(thumbnail_path)
+                    image.load()
+                return image
+            except OSError:
+                pass  # damaged cache file, build it again
+
+        with metrics.timer("thumbnails.build"):
+            return self._build(path, thumbnail_path)
+
+    def _build(self, path, thumbnail_path):
+        image = Image.open(path)
+        # Let the JPEG decoder scale down while decoding instead of decoding full size
+        image.draft("RGB", self.size)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA", "RGBa") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        image = image.resize(self.size, reducing_gap=3.0)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = thumbnail_path + ".tmp"
+        image.save(tmp_path, "PNG")
+        os.replace(tmp_path, thumbnail_path)
+        return image
+
+    def photo(self, path):
+        # Tk PhotoImage for path; reselecting a product reuses the cached one
+        key = self._key(path)
+        entry = self.photos.get(key)
+        if entry is not None:
+            self.photos.move_to_end(key)
+            metrics.count("thumbnails.memory_hits")
+            return entry[0]
+
+        image = self.thumbnail(path, key)
+        with metrics.timer("thumbnails.photo"):
+            photo = ImageTk.PhotoImage(image)
+        cost = image.width * image.height * 4
+        self.photos[key] = (photo, cost)
+        self.bytes += cost
+        # Evict least recently used photos, but always keep the one just made
+        while self.bytes > self.max_bytes and len(self.photos) > 1:
+            _, (_, evicted_cost) = self.photos.popitem(last=False)
+            self.bytes -= evicted_cost
+        return photo
+
+    def clear(self):
+        self.photos.clear()
+        self.bytes = 0